@@ -0,0 +1,71 @@
+"""
+Benchmarks the JSON backends on the real /products payloads, read from the database.
+
+Usage: python -m benchmarks.json_backends [--repeat N] [--amount N]
+"""
+
+from database.database import Database
+from utils.json_codec import JSONCodec, orjson
+from utils.models import Product
+import argparse
+import timeit
+
+
+def load_products(amount: int) -> list[dict]:
+    """
+    Loads products from the database, converted the same way the /products endpoint does.
+
+    Args:
+    - amount (int): The maximal number of products to load.
+
+    Returns:
+    - list[dict]: The products' dictionaries.
+    """
+    rows = (
+        Database.get_instance()
+        .execute("SELECT * FROM products ORDER BY productID LIMIT ?", (amount,))
+        .fetch_all()
+    )
+
+    return [Product.from_database(row).to_dict() for row in rows]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--amount", type=int, default=5)
+    args = parser.parse_args()
+
+    products = load_products(args.amount)
+    payload = {"success": True, "data": products}
+
+    print(f"{len(products)} products, {len(JSONCodec.dumps(payload))} bytes")
+    print(
+        f"{'backend':>8} {'dumps page (us)':>16} {'dumps items (us)':>17} {'loads page (us)':>16}"
+    )
+
+    backends = ["json"] + (["orjson"] if orjson is not None else [])
+
+    for backend in backends:
+        JSONCodec.use(backend)
+        document = JSONCodec.dumps(payload)
+
+        # A whole page at once, and item by item as StreamingResponse.success does
+        dumps_page = timeit.timeit(lambda: JSONCodec.dumps(payload), number=args.repeat)
+        dumps_items = timeit.timeit(
+            lambda: [JSONCodec.dumps(product) for product in products],
+            number=args.repeat,
+        )
+        loads_page = timeit.timeit(lambda: JSONCodec.loads(document), number=args.repeat)
+
+        print(
+            f"{backend:>8} {dumps_page / args.repeat * 1e6:>16.1f} "
+            f"{dumps_items / args.repeat * 1e6:>17.1f} {loads_page / args.repeat * 1e6:>16.1f}"
+        )
+
+    if orjson is None:
+        print("orjson is not installed, only the standard library was measured")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,564 @@
+"""
+Load tests the full server, started in its own process on a local port with a seeded database and images.
+
+Every client is a thread running a realistic session: a Diffie-Hellman handshake, registering and logging in,
+then a random mix of /products paging, /product/:id, wishlist toggling and listing, and plain handshake requests.
+The throughput, latency percentiles and error rate are printed as JSON, overall and per operation.
+
+Usage: python -m benchmarks.load [--clients N] [--duration S] [--mode threaded|async] [--output PATH]
+"""
+
+from config import Config
+from network.encryption.AES import AES
+from network.encryption.diffie_hellman import DiffieHellman
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+SCHEMA = (
+    'CREATE TABLE "products" (productID INTEGER PRIMARY KEY, title TEXT NOT NULL, description TEXT NOT NULL, '
+    'price REAL NOT NULL, "leftEyeX" REAL NOT NULL DEFAULT 0, "leftEyeY" REAL NOT NULL DEFAULT 0, '
+    '"rightEyeX" REAL NOT NULL DEFAULT 100, "rightEyeY" REAL NOT NULL DEFAULT 0)',
+    'CREATE TABLE "wishlists" ("token" TEXT NOT NULL, productID INTEGER NOT NULL)',
+    'CREATE TABLE "users" (email TEXT NOT NULL, username TEXT NOT NULL, password TEXT NOT NULL, '
+    "token TEXT NOT NULL, salt TEXT NOT NULL)",
+)
+"""
+The schema of the server's database.
+"""
+
+OPERATIONS = {
+    "products": 4,
+    "product": 4,
+    "wishlistToggle": 2,
+    "wishlist": 1,
+    "me": 1,
+    "plain": 1,
+}
+"""
+The operations of a session after logging in, with their relative weights.
+"""
+
+
+def seed(directory: str, products: int, image_size: int, rng: random.Random) -> None:
+    """
+    Creates the database and the product images the server uses.
+
+    Args:
+    - directory (str): The directory to create the database and the images in.
+    - products (int): The number of products.
+    - image_size (int): The size in bytes of every product image.
+    - rng (random.Random): The random generator.
+    """
+    os.makedirs(os.path.join(directory, "images"))
+
+    database = sqlite3.connect(os.path.join(directory, "database.sqlite"))
+
+    for statement in SCHEMA:
+        database.execute(statement)
+
+    database.executemany(
+        "INSERT INTO products (productID, title, description, price) VALUES (?, ?, ?, ?)",
+        [
+            (i, f"SUNGLASSES {i}", "A seeded product. " * 10, rng.randint(50, 500))
+            for i in range(1, products + 1)
+        ],
+    )
+    database.commit()
+    database.close()
+
+    # Images don't compress, just like the real PNG images
+    for i in range(1, products + 1):
+        with open(
+            os.path.join(directory, "images", f"{i}.{Config.PRODUCT_IMAGES_SUBFIX}"), "wb"
+        ) as image:
+            image.write(rng.randbytes(image_size))
+
+
+def serve(directory: str, port: int, options: dict) -> None:
+    """
+    Runs the server on the seeded data until the process is terminated, in the server's process.
+
+    Args:
+    - directory (str): The directory of the seeded database and images.
+    - port (int): The port to listen on.
+    - options (dict): Config attributes to override.
+    """
+    Config.HOST = "127.0.0.1"
+    Config.PORT = port
+    Config.DATABASE_PATH = os.path.join(directory, "database.sqlite")
+    Config.ENCRYPTIONS_PATH = os.path.join(directory, "encryptions.sqlite")
+    Config.PRODUCT_IMAGES_PATH = os.path.join(directory, "images")
+
+    for name, value in options.items():
+        setattr(Config, name, value)
+
+    # The server logs every handshake
+    sys.stdout = open(os.devnull, "w")
+
+    import main
+
+    main.run()
+
+
+class Connection:
+    """
+    A minimal persistent HTTP/1.1 client connection.
+    """
+
+    def __init__(self, port: int, timeout: float) -> None:
+        """
+        Initializes the Connection instance.
+
+        Args:
+        - port (int): The local port of the server.
+        - timeout (float): The time in seconds to wait for a response.
+        """
+        self.port: int = port
+        self.timeout: float = timeout
+        self.socket: socket.socket | None = None
+        self.file = None
+
+    def request(
+        self, method: str, path: str, body: str = "", headers: dict[str, str] = {}
+    ) -> tuple[int, bytes]:
+        """
+        Sends a request and reads its response, reconnecting if the server closed the connection.
+
+        Args:
+        - method (str): The HTTP method.
+        - path (str): The path and query of the request.
+        - body (str): The request body.
+        - headers (dict[str, str]): Additional request headers.
+
+        Raises:
+        - OSError: If the request failed.
+
+        Returns:
+        - tuple[int, bytes]: The status code and the body of the response.
+        """
+        if self.socket is None:
+            self.socket = socket.create_connection(("127.0.0.1", self.port), self.timeout)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.file = self.socket.makefile("rb")
+
+        data = body.encode()
+        head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n"
+        head += "".join(f"{key}: {value}\r\n" for key, value in headers.items())
+
+        try:
+            self.socket.sendall(head.encode() + b"\r\n" + data)
+            status, response_headers = self.read_head()
+            response = self.read_body(response_headers)
+        except OSError:
+            self.close()
+            raise
+
+        if response_headers.get("connection") == "close":
+            self.close()
+
+        return status, response
+
+    def read_head(self) -> tuple[int, dict[str, str]]:
+        """
+        Reads the status line and headers of a response.
+
+        Raises:
+        - ConnectionError: If the server closed the connection.
+
+        Returns:
+        - tuple[int, dict[str, str]]: The status code, and the headers by lowercase name.
+        """
+        status_line = self.file.readline()
+
+        if not status_line:
+            raise ConnectionError("The server closed the connection")
+
+        headers = {}
+
+        while (line := self.file.readline()) not in (b"\r\n", b""):
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        return int(status_line.split(b" ")[1]), headers
+
+    def read_body(self, headers: dict[str, str]) -> bytes:
+        """
+        Reads the body of a response, framed by its Content-Length or chunked.
+
+        Args:
+        - headers (dict[str, str]): The response headers by lowercase name.
+
+        Returns:
+        - bytes: The body.
+        """
+        if headers.get("transfer-encoding") != "chunked":
+            return self.file.read(int(headers.get("content-length", 0)))
+
+        chunks = []
+
+        while size := int(self.file.readline().split(b";")[0], 16):
+            chunks.append(self.file.read(size))
+            self.file.readline()
+
+        self.file.readline()
+
+        return b"".join(chunks)
+
+    def close(self) -> None:
+        """
+        Closes the connection, the next request opens a new one.
+        """
+        if self.socket is not None:
+            self.file.close()
+            self.socket.close()
+
+        self.socket = None
+        self.file = None
+
+
+class Session:
+    """
+    A client session, recording the latency of every request it sends.
+    """
+
+    def __init__(self, port: int, products: int, timeout: float, rng: random.Random) -> None:
+        """
+        Initializes the Session instance.
+
+        Args:
+        - port (int): The local port of the server.
+        - products (int): The number of seeded products.
+        - timeout (float): The time in seconds to wait for a response.
+        - rng (random.Random): The session's random generator.
+        """
+        self.connection: Connection = Connection(port, timeout)
+        self.products: int = products
+        self.rng: random.Random = rng
+
+        self.encryption_token: int = rng.randint(1, 2**62)
+        self.key: str = ""
+        self.token: str = ""
+
+        # (operation, start time, latency in seconds, succeeded) of every request
+        self.results: list[tuple[str, float, float, bool]] = []
+
+    def send(
+        self,
+        operation: str,
+        method: str,
+        path: str,
+        payload: dict | None = None,
+        encrypted: bool = True,
+    ) -> dict | None:
+        """
+        Sends a request, encrypting it and decrypting its response on encrypted routes, and records its result.
+
+        Args:
+        - operation (str): The name the request is recorded under.
+        - method (str): The HTTP method.
+        - path (str): The path and query of the request.
+        - payload (dict | None): The JSON payload.
+        - encrypted (bool): Whether the route is encrypted.
+
+        Returns:
+        - dict | None: The response's JSON data, or None if the request failed.
+        """
+        body = json.dumps(payload) if payload is not None else ""
+        headers = {}
+
+        if encrypted:
+            headers["encryptionToken"] = str(self.encryption_token)
+
+            if self.token:
+                headers["token"] = self.token
+
+            if body:
+                body = AES.encrypt(body, self.key)
+
+        started = time.monotonic()
+
+        try:
+            status, response = self.connection.request(method, path, body, headers)
+        except (OSError, ValueError):
+            self.results.append((operation, started, time.monotonic() - started, False))
+            return None
+
+        latency = time.monotonic() - started
+
+        try:
+            text = AES.decrypt(response.decode(), self.key) if encrypted else response.decode()
+            data = json.loads(text)
+        except ValueError:
+            data = None
+
+        succeeded = status == 200 and isinstance(data, dict) and data.get("success") is True
+        self.results.append((operation, started, latency, succeeded))
+
+        return data if succeeded else None
+
+    def start(self) -> bool:
+        """
+        Exchanges an encryption key with the server, then registers and logs in.
+
+        Returns:
+        - bool: True if the session started, False otherwise.
+        """
+        self.send("plain", "POST", "/handshake/init", {"encryptionToken": self.encryption_token}, False)
+
+        private_key = self.rng.randint(10, 10**6)
+        exchange = self.send(
+            "handshake",
+            "POST",
+            "/handshake/exchange",
+            {
+                "publicKey": DiffieHellman.generate_public_key(private_key),
+                "encryptionToken": self.encryption_token,
+            },
+            False,
+        )
+
+        if exchange is None:
+            return False
+
+        self.key = AES.diffie_hellman_key_to_aes_key(
+            DiffieHellman.generate_shared_key(exchange["serverPublicKey"], private_key)
+        )
+
+        credentials = {
+            "username": f"user{self.encryption_token}",
+            "password": "password",
+            "email": f"user{self.encryption_token}@example.com",
+        }
+
+        if self.send("register", "POST", "/register", credentials) is None:
+            return False
+
+        login = self.send("login", "POST", "/login", credentials)
+
+        if login is None:
+            return False
+
+        self.token = login["token"]
+
+        return True
+
+    def step(self) -> None:
+        """
+        Sends a random request of the session.
+        """
+        operation = self.rng.choices(list(OPERATIONS), weights=list(OPERATIONS.values()))[0]
+        product_id = self.rng.randint(1, self.products)
+
+        if operation == "products":
+            page = self.rng.randrange(max(1, self.products // 5))
+            self.send(operation, "GET", f"/products?amount=5&page={page}")
+        elif operation == "product":
+            self.send(operation, "GET", f"/product/{product_id}")
+        elif operation == "wishlistToggle":
+            self.send(operation, "POST", "/wishlistProduct", {"id": product_id})
+        elif operation == "wishlist":
+            self.send(operation, "GET", "/wishlist")
+        elif operation == "me":
+            self.send(operation, "GET", "/me")
+        else:
+            self.send(operation, "POST", "/handshake/init", {"encryptionToken": self.encryption_token}, False)
+
+    def run(self, deadline: float) -> None:
+        """
+        Runs the session until the deadline.
+
+        Args:
+        - deadline (float): The monotonic time to stop at.
+        """
+        if self.start():
+            while time.monotonic() < deadline:
+                self.step()
+
+        self.connection.close()
+
+
+def percentile(latencies: list[float], fraction: float) -> float:
+    """
+    Returns a percentile of sorted latencies, by the nearest rank.
+
+    Args:
+    - latencies (list[float]): The sorted latencies in seconds.
+    - fraction (float): The percentile, from 0 to 1.
+
+    Returns:
+    - float: The percentile in milliseconds, 0 if there are no latencies.
+    """
+    if not latencies:
+        return 0
+
+    return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+
+def summarize(results: list[tuple[str, float, float, bool]], duration: float) -> dict:
+    """
+    Summarizes the results of requests.
+
+    Args:
+    - results (list[tuple[str, float, float, bool]]): The requests' operation, start time, latency and success.
+    - duration (float): The time in seconds the requests were sent over.
+
+    Returns:
+    - dict: The number of requests and errors, the error rate, the throughput and the latency percentiles.
+    """
+    latencies = sorted(latency for _, _, latency, _ in results)
+    errors = sum(1 for *_, succeeded in results if not succeeded)
+
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "errorRate": errors / len(results) if results else 0,
+        "throughput": len(results) / duration if duration else 0,
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": latencies[-1] * 1000 if latencies else 0,
+    }
+
+
+def wait_for_server(port: int, timeout: float) -> bool:
+    """
+    Waits until the server accepts connections.
+
+    Args:
+    - port (int): The local port of the server.
+    - timeout (float): The time in seconds to wait.
+
+    Returns:
+    - bool: True if the server is up, False otherwise.
+    """
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 1).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+
+    return False
+
+
+def load_test(args: argparse.Namespace) -> dict:
+    """
+    Seeds the data, starts the server and runs the sessions against it.
+
+    Args:
+    - args (argparse.Namespace): The command line arguments.
+
+    Returns:
+    - dict: The test's configuration, along with its overall and per operation results.
+    """
+    rng = random.Random(args.seed)
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    options = {
+        "SERVER_MODE": args.mode,
+        "PROCESSES": args.processes,
+        "WORKER_POOL_SIZE": args.workers,
+        "WORKER_QUEUE_SIZE": max(Config.WORKER_QUEUE_SIZE, args.clients * 2),
+        "RATE_LIMITING": args.rate_limiting,
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        seed(directory, args.products, args.image_size, rng)
+
+        server = multiprocessing.Process(target=serve, args=(directory, port, options))
+        server.start()
+
+        try:
+            if not wait_for_server(port, 10):
+                raise RuntimeError("The server didn't start")
+
+            sessions = [
+                Session(port, args.products, args.timeout, random.Random(rng.random()))
+                for _ in range(args.clients)
+            ]
+
+            started = time.monotonic()
+            measured = started + args.warmup
+            deadline = measured + args.duration
+
+            threads = [
+                threading.Thread(target=session.run, args=(deadline,)) for session in sessions
+            ]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            duration = min(time.monotonic(), deadline) - measured
+        finally:
+            server.terminate()
+            server.join()
+
+    # Only requests started after the warmup are measured
+    results = [
+        result for session in sessions for result in session.results if result[1] >= measured
+    ]
+
+    return {
+        "config": {
+            "clients": args.clients,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mode": args.mode,
+            "processes": args.processes,
+            "workers": args.workers,
+            "products": args.products,
+            "imageSize": args.image_size,
+            "seed": args.seed,
+        },
+        "total": summarize(results, duration),
+        "operations": {
+            operation: summarize([result for result in results if result[0] == operation], duration)
+            for operation in sorted({result[0] for result in results})
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=1)
+    parser.add_argument("--mode", choices=("threaded", "async"), default=Config.SERVER_MODE)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=Config.WORKER_POOL_SIZE)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--image-size", type=int, default=100000)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--rate-limiting", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="a file to write the results to, instead of the standard output")
+    args = parser.parse_args()
+
+    results = json.dumps(load_test(args), indent=2)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(results + "\n")
+    else:
+        print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Microbenchmarks of the per-request hot paths, on seeded data of realistic sizes.
+
+Results can be saved as JSON, and compared with a saved baseline, flagging the benchmarks that got slower
+than the threshold. The comparison exits with status 1 if any benchmark regressed.
+
+Usage: python -m benchmarks.micro [--filter TEXT] [--output PATH] [--compare PATH] [--threshold FRACTION]
+"""
+
+from benchmarks.load import seed
+from config import Config
+from database.database import Database
+from network.data import Data
+from network.encryption.AES import AES
+from network.parser import RequestParser
+from network.protocol import HTTPMethod, Request, Response, StreamingResponse
+from network.router import Router
+from typing import Callable
+from utils.checks import authenticated
+from utils.models import Product
+import argparse
+import endpoints
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import timeit
+
+KEY = "17e2053f934441a37f11f13762f40879f3affce686db44b65b87a0b9b052a7a1"
+"""
+The AES key of the benchmarks.
+"""
+
+TOKEN = "0123456789abcdef0123456789abcdef"
+"""
+The auth token of the seeded user.
+"""
+
+
+def create_benchmarks(directory: str) -> dict[str, Callable[[], object]]:
+    """
+    Seeds the data in a directory and creates the benchmarks using it.
+
+    Args:
+    - directory (str): The directory to seed the database and the images in.
+
+    Returns:
+    - dict[str, Callable[[], object]]: The benchmarks by name.
+    """
+    seed(directory, 10, 100000, random.Random(0))
+
+    database = sqlite3.connect(os.path.join(directory, "database.sqlite"))
+    database.execute(
+        "INSERT INTO users (email, username, password, token, salt) VALUES (?, ?, ?, ?, ?)",
+        ("user@example.com", "user", "password", TOKEN, "salt"),
+    )
+    database.commit()
+    database.close()
+
+    Config.DATABASE_PATH = os.path.join(directory, "database.sqlite")
+    Config.PRODUCT_IMAGES_PATH = os.path.join(directory, "images")
+
+    db = Database.get_instance()
+    row = db.execute("SELECT * FROM products WHERE productID = 1").fetch_one()
+    product = Product.from_database(row).to_dict()
+
+    # A login request, and a request for a product page with the headers of the mobile app
+    login = json.dumps({"username": "username", "password": "password"})
+    encrypted_login = AES.encrypt(login, KEY)
+    encrypted_product = AES.encrypt(json.dumps(product), KEY)
+    raw_login = (
+        b"POST /login HTTP/1.1\r\nHost: localhost\r\nencryptionToken: 4242\r\n"
+        b"Content-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+        % (len(encrypted_login), encrypted_login.encode())
+    )
+    raw_products = (
+        b"GET /products?amount=5&page=0 HTTP/1.1\r\nHost: localhost\r\nencryptionToken: 4242\r\n"
+        b"token: " + TOKEN.encode() + b"\r\nAccept-Encoding: gzip\r\nUser-Agent: okhttp/4.9.2\r\n\r\n"
+    )
+
+    parser = RequestParser()
+
+    def parse(data: bytes) -> Request:
+        parser.feed(data)
+        return parser.next_request()
+
+    products_request = parse(raw_products)
+    product_request = Request(HTTPMethod.GET, "/product/3", headers={"token": TOKEN})
+    missing_request = Request(HTTPMethod.GET, "/missing/route")
+    lookup = authenticated(lambda data: None)
+    auth_data = Data(products_request, db, None, None)
+
+    return {
+        "parse.login": lambda: parse(raw_login),
+        "parse.products": lambda: parse(raw_products),
+        "router.static": lambda: Router.get_endpoint(products_request),
+        "router.parameter": lambda: Router.get_endpoint(product_request),
+        "router.missing": lambda: Router.get_endpoint(missing_request),
+        "aes.encrypt.login": lambda: AES.encrypt(login, KEY),
+        "aes.decrypt.login": lambda: AES.decrypt(encrypted_login, KEY),
+        "aes.encrypt.product": lambda: AES.encrypt_bytes(json.dumps(product).encode(), KEY),
+        "aes.decrypt.product": lambda: AES.decrypt(encrypted_product, KEY),
+        "product.load": lambda: Product.from_database(row).to_dict(),
+        "response.small": lambda: Response.success({"now": 0}).to_http_string(),
+        "response.product": lambda: Response.success(product).to_http_string(),
+        "response.stream": lambda: StreamingResponse.success(iter([product] * 5)).to_http_string(),
+        "auth.lookup": lambda: lookup(auth_data),
+    }
+
+
+def measure(benchmark: Callable[[], object], repeat: int) -> dict[str, float]:
+    """
+    Measures a benchmark, running it in rounds of at least 0.2 seconds.
+
+    Args:
+    - benchmark (Callable[[], object]): The benchmark.
+    - repeat (int): The number of rounds.
+
+    Returns:
+    - dict[str, float]: The fastest and the median time of a single run, in microseconds.
+    """
+    timer = timeit.Timer(benchmark)
+    number, _ = timer.autorange()
+    rounds = sorted(time / number * 1e6 for time in timer.repeat(repeat, number))
+
+    return {"min": rounds[0], "median": rounds[len(rounds) // 2]}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """
+    Prints how every benchmark changed since the baseline.
+
+    Args:
+    - results (dict): The current results by benchmark name.
+    - baseline (dict): The baseline results by benchmark name.
+    - threshold (float): The relative slowdown of the fastest run considered a regression (e.g. 0.1 for 10%).
+
+    Returns:
+    - bool: True if no benchmark regressed, False otherwise.
+    """
+    regressions = 0
+
+    print(f"{'benchmark':<22} {'baseline (us)':>14} {'current (us)':>13} {'change':>8}")
+
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<22} {'-':>14} {result['min']:>13.2f} {'new':>8}")
+            continue
+
+        change = result["min"] / baseline[name]["min"] - 1
+        flag = ""
+
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -threshold:
+            flag = "  improved"
+
+        print(
+            f"{name:<22} {baseline[name]['min']:>14.2f} {result['min']:>13.2f} {change:>+8.1%}{flag}"
+        )
+
+    print(f"{regressions} regressions over {threshold:.0%}")
+
+    return regressions == 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filter", default="", help="only run the benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--output", help="a file to save the results to as JSON")
+    parser.add_argument("--compare", help="a file of saved results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        benchmarks = create_benchmarks(directory)
+        results = {}
+
+        for name, benchmark in benchmarks.items():
+            if args.filter in name:
+                results[name] = measure(benchmark, args.repeat)
+
+                if not args.compare:
+                    print(f"{name:<22} {results[name]['min']:>10.2f} us (median {results[name]['median']:.2f} us)")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            if not compare(results, json.load(baseline), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Benchmarks RequestParser against the former framing and Request.from_raw parsing, and fuzzes it.
+
+The fuzzer mutates valid requests and feeds them in random pieces, checking that the parser only ever
+returns requests or raises ParseError, and that its results don't depend on how the data was split.
+
+Usage: python -m benchmarks.parser [--repeat N] [--fuzz N] [--seed N]
+"""
+
+from network.parser import ParseError, RequestParser
+from network.protocol import HTTPMethod, Request
+from utils.json_codec import JSONCodec
+import argparse
+import random
+import sys
+import timeit
+
+REQUESTS = {
+    "get": b"GET /ping HTTP/1.1\r\nHost: localhost\r\n\r\n",
+    "query": (
+        b"GET /products?amount=5&page=0&q=sun%20glasses HTTP/1.1\r\n"
+        + b"".join(b"X-Header-%d: value %d\r\n" % (i, i) for i in range(20))
+        + b"\r\n"
+    ),
+    "post": (
+        b"POST /login HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        b"Content-Length: 1036\r\n\r\n"
+        b'{"username": "username", "password": "' + b"p" * 1000 + b'"}'
+    ),
+    "chunked": (
+        b"POST /login HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+        b'5\r\n{"use\r\n1d\r\nrname": "u", "password": "p"}\r\n0\r\n\r\n'
+    ),
+}
+
+
+def legacy_parse(data: bytes) -> Request:
+    """
+    The former parsing, framing a Content-Length request then parsing it with the former Request.from_raw.
+
+    Args:
+    - data (bytes): A complete request.
+
+    Returns:
+    - Request: The parsed request.
+    """
+
+    # RequestFramer.next_message and parse_head
+    headers_end = data.find(b"\r\n\r\n")
+    content_length = 0
+
+    for line in data[:headers_end].split(b"\r\n")[1:]:
+        key, _, value = line.partition(b":")
+
+        if key.strip().lower() == b"content-length":
+            content_length = int(value)
+
+    request = memoryview(data)[: headers_end + 4 + content_length].tobytes()
+
+    # Request.from_raw
+    lines = request[:headers_end].decode().split("\r\n")
+    method = HTTPMethod(lines[0].split("\r\n")[0].split(" ")[0])
+    url = lines[0].split(" ")[1]
+    version = lines[0].split(" ")[-1]
+
+    headers = {}
+    params = {}
+    payload = {}
+    body = ""
+
+    for line in lines[1:]:
+        key, value = line.split(": ", 1)
+        headers[key] = value.strip()
+
+    if "?" in url:
+        url, query_string = url.split("?", 1)
+        params = dict(param.split("=") for param in query_string.split("&"))
+
+    if method == HTTPMethod.POST and headers_end + 4 < len(request):
+        body = str(memoryview(request)[headers_end + 4 :], "utf-8")
+        payload = JSONCodec.parse(body, {})
+
+    return Request(method, url, params, {}, body, headers, payload, version)
+
+
+def parse(parser: RequestParser, data: bytes, pieces: int = 1) -> list[Request]:
+    """
+    Parses all the requests in the data, feeding it to the parser in a few pieces.
+
+    Args:
+    - parser (RequestParser): The parser, reused like a connection's parser.
+    - data (bytes): The received data.
+    - pieces (int): The number of pieces to split the data into.
+
+    Returns:
+    - list[Request]: The parsed requests.
+    """
+    requests = []
+    size = max(1, -(-len(data) // pieces))
+
+    for i in range(0, len(data), size):
+        parser.feed(data[i : i + size])
+
+        while (request := parser.next_request()) is not None:
+            requests.append(request)
+
+    return requests
+
+
+def benchmark(repeat: int) -> None:
+    """
+    Prints the time it takes to parse every sample request with both parsers.
+
+    Args:
+    - repeat (int): The number of times every request is parsed.
+    """
+    print(f"{'request':>8} {'parser (us)':>12} {'in 8 pieces (us)':>17} {'former (us)':>12}")
+
+    parser = RequestParser()
+
+    for name, data in REQUESTS.items():
+        new = timeit.timeit(lambda: parse(parser, data), number=repeat)
+        pieces = timeit.timeit(lambda: parse(parser, data, 8), number=repeat)
+
+        # The former parser didn't support chunked bodies once framed
+        if name == "chunked":
+            former = "-"
+        else:
+            former = f"{timeit.timeit(lambda: legacy_parse(data), number=repeat) / repeat * 1e6:.2f}"
+
+        print(
+            f"{name:>8} {new / repeat * 1e6:>12.2f} {pieces / repeat * 1e6:>17.2f} {former:>12}"
+        )
+
+
+def mutate(data: bytes, rng: random.Random) -> bytes:
+    """
+    Applies a few random mutations to a request.
+
+    Args:
+    - data (bytes): The request.
+    - rng (random.Random): The random generator.
+
+    Returns:
+    - bytes: The mutated request.
+    """
+    data = bytearray(data)
+    tokens = [b"\r\n", b"\r\n\r\n", b":", b" ", b"%", b"?", b"&", b"=", b"\xff", b"0", b"-1", b"ffffffff"]
+
+    for _ in range(rng.randint(1, 4)):
+        position = rng.randint(0, len(data))
+        mutation = rng.randrange(5)
+
+        if mutation == 0 and data:
+            data[min(position, len(data) - 1)] = rng.randrange(256)
+        elif mutation == 1:
+            data[position:position] = rng.choice(tokens)
+        elif mutation == 2:
+            del data[position : position + rng.randint(1, 8)]
+        elif mutation == 3:
+            data = data[:position]
+        else:
+            data += data[position:]
+
+    return bytes(data)
+
+
+def outcome(data: bytes, pieces: int) -> tuple:
+    """
+    Parses the data and summarizes the result, to compare results of different splits.
+
+    Args:
+    - data (bytes): The received data.
+    - pieces (int): The number of pieces to split the data into.
+
+    Returns:
+    - tuple: The parsed requests' summaries, followed by the error status if parsing failed.
+    """
+    parser = RequestParser(max_header_count=50, max_header_size=4096, max_body_size=65536)
+    summaries = []
+    size = max(1, -(-len(data) // pieces))
+
+    try:
+        for i in range(0, len(data), size):
+            parser.feed(data[i : i + size])
+
+            while (request := parser.next_request()) is not None:
+                summaries.append(
+                    (
+                        request.method,
+                        request.url,
+                        request.params,
+                        dict(request.headers.items()),
+                        request.body,
+                        request.version,
+                    )
+                )
+    except ParseError as e:
+        return tuple(summaries) + (e.status,)
+
+    return tuple(summaries)
+
+
+def fuzz(iterations: int, seed: int) -> bool:
+    """
+    Fuzzes the parser with mutated requests.
+
+    Args:
+    - iterations (int): The number of mutated requests to parse.
+    - seed (int): The seed of the random generator.
+
+    Returns:
+    - bool: True if the parser behaved correctly for every input, False otherwise.
+    """
+    rng = random.Random(seed)
+    samples = list(REQUESTS.values())
+    errors = 0
+
+    for i in range(iterations):
+        data = mutate(b"".join(rng.choices(samples, k=rng.randint(1, 3))), rng)
+
+        try:
+            whole = outcome(data, 1)
+            split = outcome(data, rng.randint(2, 16))
+        except Exception as e:
+            print(f"Iteration {i}: {type(e).__name__}: {e} for {data!r}")
+            errors += 1
+            continue
+
+        if whole != split:
+            print(f"Iteration {i}: results depend on the split for {data!r}")
+            errors += 1
+
+    print(f"Fuzzed {iterations} requests (seed {seed}), {errors} failures")
+
+    return errors == 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20000)
+    parser.add_argument("--fuzz", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.fuzz:
+        sys.exit(0 if fuzz(args.fuzz, args.seed) else 1)
+
+    benchmark(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmarks Router.get_endpoint against the former linear matching, for growing numbers of routes.
+
+Usage: python -m benchmarks.router [--lookups N] [--linear-lookups N]
+"""
+
+from network.router import Router
+from network.protocol import Request, HTTPMethod
+from network.endpoint import Endpoint
+import argparse
+import timeit
+
+
+def create_router(routes: int) -> type[Router]:
+    """
+    Creates a router with its own route tables, holding half static and half parameterized routes.
+
+    Args:
+    - routes (int): The number of routes to register.
+
+    Returns:
+    - type[Router]: The created router.
+    """
+
+    class BenchmarkRouter(Router):
+        endpoints: list[Endpoint] = []
+        static_routes: dict = {}
+        dynamic_routes: dict = {}
+        static_segments: dict = {}
+
+    for i in range(routes // 2):
+        BenchmarkRouter.route(f"/static{i}/items", HTTPMethod.GET)(lambda data: None)
+        BenchmarkRouter.route(f"/dynamic{i}/:id", HTTPMethod.GET)(lambda data: None)
+
+    return BenchmarkRouter
+
+
+def linear_get_endpoint(router: type[Router], request: Request) -> Endpoint:
+    """
+    The former Router.get_endpoint, filtering all the endpoints and matching them one by one.
+
+    Args:
+    - router (type[Router]): The router holding the endpoints.
+    - request (Request): The request to route.
+
+    Returns:
+    - Endpoint: The endpoint matching the request.
+    """
+    filtered_endpoints = list(
+        filter(lambda e: e.method == request.method, router.endpoints)
+    )
+
+    for endpoint in filtered_endpoints:
+        if Router.urls_match_pattern(endpoint.url, request.url):
+            return endpoint
+
+    return Endpoint.default_endpoint()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument(
+        "--linear-lookups",
+        type=int,
+        default=50,
+        help="the lookups of the linear matching, fewer since it takes milliseconds with many routes",
+    )
+    args = parser.parse_args()
+
+    print(f"{'routes':>8} {'request':>8} {'compiled (us)':>14} {'linear (us)':>12}", flush=True)
+
+    for routes in (10, 100, 1000, 10000):
+        router = create_router(routes)
+        last = routes // 2 - 1
+
+        # The last registered routes are the worst case for the linear matching
+        requests = {
+            "static": Request(HTTPMethod.GET, f"/static{last}/items"),
+            "dynamic": Request(HTTPMethod.GET, f"/dynamic{last}/42"),
+            "missing": Request(HTTPMethod.GET, "/missing/route"),
+        }
+
+        for name, request in requests.items():
+            compiled = timeit.timeit(
+                lambda: router.get_endpoint(request), number=args.lookups
+            )
+            linear = timeit.timeit(
+                lambda: linear_get_endpoint(router, request), number=args.linear_lookups
+            )
+
+            print(
+                f"{routes:>8} {name:>8} "
+                f"{compiled / args.lookups * 1e6:>14.3f} {linear / args.linear_lookups * 1e6:>12.3f}",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
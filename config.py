@@ -28,7 +28,157 @@ class Config:
     The file extension for product images.
     """
 
+    PRODUCT_IMAGES_MAX_AGE: int = 3600
+    """
+    The time in seconds clients may cache the images served by /image/:id for before revalidating them.
+    """
+
     SOCKET_TIMEOUT: int = 1
     """
-    The timeout duration for socket operations, in seconds.
+    The time in seconds a new connection is given to start sending its first request.
+    """
+
+    SERVER_MODE: str = "threaded"
+    """
+    The server implementation to run, either "threaded" (a selector-based reactor handing received requests to a bounded worker thread pool) or "async" (a single asyncio event loop).
+    """
+
+    ASYNC_EXECUTOR_WORKERS: int = 32
+    """
+    The number of threads used by the async server to run blocking endpoint handlers.
+    """
+
+    WORKER_POOL_SIZE: int = 16
+    """
+    The number of worker threads handling clients in the threaded server.
+    """
+
+    WORKER_QUEUE_SIZE: int = 64
+    """
+    The maximum number of accepted clients waiting for a free worker, beyond which new clients are rejected.
+    """
+
+    WORKER_POOL_REPORT_INTERVAL: float = 0
+    """
+    The interval in seconds between worker pool queue reports, 0 to disable them.
+    """
+
+    KEEP_ALIVE_TIMEOUT: float = 5.0
+    """
+    The time in seconds an idle persistent connection is kept open, waiting for its next request.
+    """
+
+    MAX_KEEP_ALIVE_REQUESTS: int = 100
+    """
+    The maximum number of requests served on a single persistent connection before it is closed.
+    """
+
+    RECEIVE_BUFFER_SIZE: int = 16384
+    """
+    The size in bytes of the buffer every client's data is received into.
+    """
+
+    PROCESSES: int = 1
+    """
+    The number of pre-forked server processes sharing the port, 1 to run the server in this process only.
+    """
+
+    ENCRYPTION_TTL: float | None = None
+    """
+    The time in seconds an encryption key is valid for after the handshake exchanging it (clients must then repeat the handshake), None for keys that never expire.
+    """
+
+    ENCRYPTIONS_PATH: str = "./database/encryptions.sqlite"
+    """
+    The SQLite file pre-forked server processes share the exchanged encryption keys through, kept apart from the application's database.
+    """
+
+    COMPRESSION_THRESHOLD: int = 1024
+    """
+    The minimal body size in bytes for responses to be compressed (when the client accepts gzip or deflate), negative to disable compression.
+    """
+
+    COMPRESSION_LEVEL: int = 6
+    """
+    The compression level of responses, from 1 (fastest) to 9 (smallest).
+    """
+
+    MAX_HEADER_COUNT: int = 100
+    """
+    The maximum number of headers in a request, larger requests are answered with 431.
+    """
+
+    MAX_HEADER_SIZE: int = 8192
+    """
+    The maximum size in bytes of a request's line and headers, larger requests are answered with 431.
+    """
+
+    MAX_BODY_SIZE: int = 1048576
+    """
+    The maximum size in bytes of a request's body, larger requests are answered with 413.
+    """
+
+    HEADER_TIMEOUT: float = 5.0
+    """
+    The time in seconds a request's line and headers must be received within once it starts arriving, slower clients are disconnected.
+    """
+
+    BODY_TIMEOUT: float = 10.0
+    """
+    The time in seconds a request's body must be received within once its headers were received, slower clients are disconnected.
+    """
+
+    WRITE_TIMEOUT: float = 10.0
+    """
+    The time in seconds a response must be sent within, slower clients are disconnected.
+    """
+
+    SHUTDOWN_TIMEOUT: float = 5.0
+    """
+    The time in seconds in-flight requests are given to finish when the server stops, before their connections are closed.
+    """
+
+    JSON_BACKEND: str = "auto"
+    """
+    The JSON library used to encode and decode bodies, either "orjson", "json" (the standard library) or "auto" to use orjson when it is installed.
+    """
+
+    RATE_LIMITING: bool = True
+    """
+    Whether to enforce the routes' rate limits, requests over budget are answered with 429.
+    """
+
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    """
+    The number of rate limited clients tracked in memory, beyond which idle clients are forgotten.
+    """
+
+    PROFILING: bool = False
+    """
+    Whether to profile a sample of the requests from the start, profiling can also be toggled by sending SIGUSR1 to the server.
+    """
+
+    PROFILING_SAMPLE_RATE: float = 0.01
+    """
+    The fraction of requests profiled while profiling is enabled.
+    """
+
+    PROFILING_DIRECTORY: str = "./profiles"
+    """
+    The directory the aggregated profile of every endpoint is written to.
+    """
+
+    PROFILING_SECRET: str = ""
+    """
+    An admin secret requests can send in an X-Profile header to always be profiled, empty to disable the header.
+    """
+
+    CORS_MAX_AGE: int = 86400
+    """
+    The time in seconds browsers may cache the answers to CORS preflight requests for (browsers may cap it, e.g. Chromium at 2 hours).
+    """
+
+    SERVER_TIMING: bool = False
+    """
+    Whether to add a Server-Timing header with the duration of every phase to all responses, clients can also ask for it with an "X-Server-Timing: 1" header.
     """
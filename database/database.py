@@ -1,6 +1,8 @@
 from config import Config
+from utils.metrics import Metrics
 import sqlite3
 import threading
+import time
 
 
 class Database(sqlite3.Connection):
@@ -59,8 +61,14 @@ class Database(sqlite3.Connection):
         Returns:
         - Cursor: The cursor object.
         """
-        with self.lock:
-            return Cursor(super().execute(*args, **kwargs))
+        started = time.perf_counter()
+
+        try:
+            with self.lock:
+                return Cursor(super().execute(*args, **kwargs))
+        finally:
+            # Attribute the time spent waiting for and running the query to the request being handled
+            Metrics.add_timing("db", time.perf_counter() - started)
 
     def executemany(self, *args, **kwargs) -> "Cursor":
         """
@@ -73,8 +81,14 @@ class Database(sqlite3.Connection):
         Returns:
         - Cursor: The cursor object.
         """
-        with self.lock:
-            return Cursor(super().executemany(*args, **kwargs))
+        started = time.perf_counter()
+
+        try:
+            with self.lock:
+                return Cursor(super().executemany(*args, **kwargs))
+        finally:
+            # Attribute the time spent waiting for and running the query to the request being handled
+            Metrics.add_timing("db", time.perf_counter() - started)
 
 
 class Cursor:
@@ -1,8 +1,10 @@
 from network.encryption.AES import AES
 from network.encryption.diffie_hellman import DiffieHellman, DiffieHellmanState
-from network.protocol import Response, HTTPMethod
+from config import Config
+from network.protocol import FileResponse, Response, StreamingResponse, HTTPMethod
 from network.data import Data
 from network.router import Router
+from utils.metrics import Metrics
 from utils.models import Product
 from utils.utils import generate_salt
 import utils.checks as chekcs
@@ -11,7 +13,7 @@ import time
 import hashlib
 
 
-@Router.route("/me", HTTPMethod.GET)
+@Router.route("/me", HTTPMethod.GET, rate_limit=(10, 30))
 @chekcs.authenticated
 def me(data: Data) -> Response:
     return Response.success(
@@ -19,7 +21,7 @@ def me(data: Data) -> Response:
     )
 
 
-@Router.route("/register", HTTPMethod.POST)
+@Router.route("/register", HTTPMethod.POST, rate_limit=(0.2, 5))
 def register(data: Data) -> Response:
     if not chekcs.register(data.request):
         return Response.error("Invalid Request")
@@ -55,7 +57,7 @@ def register(data: Data) -> Response:
     return Response.success({"message": "Registered successfully!", "token": token})
 
 
-@Router.route("/login", HTTPMethod.POST)
+@Router.route("/login", HTTPMethod.POST, rate_limit=(0.5, 10))
 def login(data: Data) -> Response:
     if not chekcs.login(data.request):
         return Response.error("Invalid Request")
@@ -82,33 +84,30 @@ def login(data: Data) -> Response:
     )
 
 
-@Router.route("/wishlist", HTTPMethod.GET)
+@Router.route("/wishlist", HTTPMethod.GET, rate_limit=(10, 30))
 @chekcs.authenticated
 def wishlist(data: Data) -> Response:
-    wishlist = data.db.execute(
-        "SELECT productID FROM wishlists WHERE token = ?",
+    # Removing the wishlisted products that don't exist anymore, before the response is sent
+    data.db.execute(
+        "DELETE FROM wishlists WHERE token = ? AND productID NOT IN (SELECT productID FROM products)",
         (data.user.token,),
-    ).fetch_all()
-
-    products: list[Product] = []
-
-    for p in wishlist:
-        product = data.db.execute(
-            "SELECT * FROM products WHERE productID = ?", (p["productID"],)
-        ).fetch_one()
+    )
 
-        if product == None:
-            data.db.execute(
-                "DELETE FROM wishlists WHERE productID = ?", (p["productID"],)
-            )
-            continue
+    # The rows are fetched up front, so no statement is left open while the response is sent. They hold no images so they are small
+    rows = data.db.execute(
+        "SELECT products.* FROM wishlists JOIN products ON products.productID = wishlists.productID WHERE wishlists.token = ? ORDER BY wishlists.rowid",
+        (data.user.token,),
+    ).fetch_all()
 
-        products.append(Product.from_database(product))
+    image_url = chekcs.image_url(data.request)
 
-    return Response.success(list(map(lambda p: p.to_dict(False), products)))
+    # Products are converted, and their images loaded, one by one while the response is sent
+    return StreamingResponse.success(
+        Product.from_database(p).to_dict(False, image_url) for p in rows
+    )
 
 
-@Router.route("/wishlistProduct", HTTPMethod.POST)
+@Router.route("/wishlistProduct", HTTPMethod.POST, rate_limit=(10, 30))
 @chekcs.authenticated
 def wishlist_product(data: Data) -> Response:
     if not chekcs.wishlist_product(data.request):
@@ -139,15 +138,17 @@ def wishlist_product(data: Data) -> Response:
     )
 
 
-@Router.route("/product/:id", HTTPMethod.GET)
+@Router.route(
+    "/product/:id",
+    HTTPMethod.GET,
+    converters={"id": chekcs.product_id},
+    rate_limit=(20, 60),
+)
 @chekcs.authenticated
 def product(data: Data) -> Response:
-    if not chekcs.product(data.request):
-        return Response.error("Invalid Request")
-
     product = data.db.execute(
         "SELECT * FROM products WHERE productID = ?",
-        (data.request.path_variables[1],),
+        (data.request.path_params["id"],),
     ).fetch_one()
 
     if product == None:
@@ -156,17 +157,33 @@ def product(data: Data) -> Response:
     in_wishlist = (
         data.db.execute(
             "SELECT * FROM wishlists WHERE token = ? AND productID = ?",
-            (data.user.token, data.request.path_variables[1]),
+            (data.user.token, data.request.path_params["id"]),
         ).fetch_one()
         != None
     )
 
+    image_url = chekcs.image_url(data.request)
+
+    # The response depends on the encryption key, so it is part of the ETag
+    etag = Response.etag(
+        Product.version(product),
+        in_wishlist,
+        image_url,
+        data.request.get_header("encryptionToken"),
+    )
+
+    if data.request.matches_etag(etag):
+        return Response.not_modified(etag)
+
     product = Product.from_database(product, in_wishlist)
 
-    return Response.success(product.to_dict())
+    response = Response.success(product.to_dict(image_url=image_url))
+    response.set_header("ETag", etag)
+
+    return response
 
 
-@Router.route("/products", HTTPMethod.GET)
+@Router.route("/products", HTTPMethod.GET, rate_limit=(10, 30))
 @chekcs.authenticated
 def products(data: Data) -> Response:
     if not chekcs.products(data.request):
@@ -176,7 +193,9 @@ def products(data: Data) -> Response:
     page = int(data.request.params.get("page") or 0)
     offset = page * amount
 
-    ps = data.db.execute(
+    # The page's rows are fetched up front since its ETag depends on all of them, they hold no images so they are small.
+    # Only the images are loaded while the response is sent
+    rows = data.db.execute(
         "SELECT * FROM products ORDER BY productID LIMIT ? OFFSET ?",
         (
             amount,
@@ -184,12 +203,46 @@ def products(data: Data) -> Response:
         ),
     ).fetch_all()
 
-    products: list[Product] = []
+    image_url = chekcs.image_url(data.request)
 
-    for p in ps:
-        products.append(Product.from_database(p))
+    # The page's version is derived from its rows, before any image is loaded
+    etag = Response.etag(
+        amount,
+        page,
+        [Product.version(p) for p in rows],
+        image_url,
+        data.request.get_header("encryptionToken"),
+    )
 
-    return Response.success(list(map(lambda p: p.to_dict(), products)))
+    if data.request.matches_etag(etag):
+        return Response.not_modified(etag)
+
+    # Products are converted, and their images loaded, one by one while the response is sent
+    response = StreamingResponse.success(
+        Product.from_database(p).to_dict(image_url=image_url) for p in rows
+    )
+    response.set_header("ETag", etag)
+
+    return response
+
+
+@Router.route(
+    "/image/:id",
+    HTTPMethod.GET,
+    encrypted=False,
+    converters={"id": chekcs.product_id},
+    rate_limit=(50, 200),
+)
+@chekcs.authenticated
+def image(data: Data) -> Response:
+    # Images are only served to logged in users, like the products they belong to.
+    # The image is sent as is, straight from the disk, so it isn't encrypted, and only private caches may keep it
+    return FileResponse.serve(
+        data.request,
+        Product.image_path(data.request.path_params["id"]),
+        Config.PRODUCT_IMAGES_MAX_AGE,
+        public=False,
+    )
 
 
 @Router.route("/", HTTPMethod.GET)
@@ -202,7 +255,15 @@ def ping(data: Data) -> Response:
     return Response.success({"now": time.time()})
 
 
-@Router.route("/handshake/init", HTTPMethod.POST, encrypted=False)
+@Router.route("/metrics", HTTPMethod.GET, encrypted=False, blocking=False)
+def metrics(data: Data) -> Response:
+    response = Response({"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+    response.body = Metrics.export(data.server.gauges()).encode()
+
+    return response
+
+
+@Router.route("/handshake/init", HTTPMethod.POST, encrypted=False, blocking=False)
 def handshake_init(data: Data) -> Response:
     if not chekcs.handshake(data.request, DiffieHellmanState.INITIALIZING):
         return Response.error("Invalid Request")
@@ -210,7 +271,9 @@ def handshake_init(data: Data) -> Response:
     return Response.success(DiffieHellman.get_public_params())
 
 
-@Router.route("/handshake/exchange", HTTPMethod.POST, encrypted=False)
+@Router.route(
+    "/handshake/exchange", HTTPMethod.POST, encrypted=False, rate_limit=(1, 5)
+)
 def handshake_exchange(data: Data) -> Response:
     if not chekcs.handshake(data.request, DiffieHellmanState.EXCHANGING_KEYS):
         return Response.error("Invalid Request")
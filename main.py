@@ -1,14 +1,131 @@
 from network.server import Server
+from network.async_server import AsyncServer
+from network.prefork import PreforkServer
+from network.profiler import Profiler
+from network.encryption.shared_encryptions import Encryptions, SharedEncryptions
+from utils.json_codec import JSONCodec
 from config import Config
 import endpoints
+import signal
+import threading
 
-if __name__ == "__main__":
-    server = Server(
+
+def create_server() -> Server:
+    """
+    Creates the server configured by the Config class.
+
+    Returns:
+    - Server: The created server.
+    """
+    JSONCodec.use(Config.JSON_BACKEND)
+
+    # Pre-forked workers share the port, and the exchanged encryption keys through their own file
+    prefork = Config.PROCESSES > 1
+    encryptions = (
+        SharedEncryptions(Config.ENCRYPTIONS_PATH, Config.ENCRYPTION_TTL)
+        if prefork
+        else Encryptions(Config.ENCRYPTION_TTL)
+    )
+
+    if Config.SERVER_MODE == "async":
+        return AsyncServer(
+            host=Config.HOST,
+            port=Config.PORT,
+            timeout=Config.SOCKET_TIMEOUT,
+            executor_workers=Config.ASYNC_EXECUTOR_WORKERS,
+            keep_alive_timeout=Config.KEEP_ALIVE_TIMEOUT,
+            max_keep_alive_requests=Config.MAX_KEEP_ALIVE_REQUESTS,
+            receive_buffer_size=Config.RECEIVE_BUFFER_SIZE,
+            reuse_port=prefork,
+            encryptions=encryptions,
+            compression_threshold=Config.COMPRESSION_THRESHOLD,
+            compression_level=Config.COMPRESSION_LEVEL,
+            max_header_count=Config.MAX_HEADER_COUNT,
+            max_header_size=Config.MAX_HEADER_SIZE,
+            max_body_size=Config.MAX_BODY_SIZE,
+            shutdown_timeout=Config.SHUTDOWN_TIMEOUT,
+            header_timeout=Config.HEADER_TIMEOUT,
+            body_timeout=Config.BODY_TIMEOUT,
+            write_timeout=Config.WRITE_TIMEOUT,
+            server_timing=Config.SERVER_TIMING,
+            cors_max_age=Config.CORS_MAX_AGE,
+            rate_limiting=Config.RATE_LIMITING,
+            rate_limit_max_keys=Config.RATE_LIMIT_MAX_KEYS,
+            profiler=create_profiler(),
+        )
+
+    return Server(
         host=Config.HOST,
         port=Config.PORT,
+        workers=Config.WORKER_POOL_SIZE,
+        queue_size=Config.WORKER_QUEUE_SIZE,
         timeout=Config.SOCKET_TIMEOUT,
+        report_interval=Config.WORKER_POOL_REPORT_INTERVAL,
+        keep_alive_timeout=Config.KEEP_ALIVE_TIMEOUT,
+        max_keep_alive_requests=Config.MAX_KEEP_ALIVE_REQUESTS,
+        receive_buffer_size=Config.RECEIVE_BUFFER_SIZE,
+        reuse_port=prefork,
+        encryptions=encryptions,
+        compression_threshold=Config.COMPRESSION_THRESHOLD,
+        compression_level=Config.COMPRESSION_LEVEL,
+        max_header_count=Config.MAX_HEADER_COUNT,
+        max_header_size=Config.MAX_HEADER_SIZE,
+        max_body_size=Config.MAX_BODY_SIZE,
+        shutdown_timeout=Config.SHUTDOWN_TIMEOUT,
+        header_timeout=Config.HEADER_TIMEOUT,
+        body_timeout=Config.BODY_TIMEOUT,
+        write_timeout=Config.WRITE_TIMEOUT,
+        server_timing=Config.SERVER_TIMING,
+        cors_max_age=Config.CORS_MAX_AGE,
+        rate_limiting=Config.RATE_LIMITING,
+        rate_limit_max_keys=Config.RATE_LIMIT_MAX_KEYS,
+        profiler=create_profiler(),
+    )
+
+
+def create_profiler() -> Profiler:
+    """
+    Creates the request profiler configured by the Config class.
+
+    Returns:
+    - Profiler: The created profiler.
+    """
+    return Profiler(
+        directory=Config.PROFILING_DIRECTORY,
+        sample_rate=Config.PROFILING_SAMPLE_RATE,
+        secret=Config.PROFILING_SECRET,
+        enabled=Config.PROFILING,
     )
 
-    server.start()
 
-    print("Server started!")
+def run() -> None:
+    """
+    Runs the server configured by the Config class until the process is interrupted or terminated.
+    """
+    if Config.PROCESSES > 1:
+        # Keys exchanged before a restart are not valid anymore, as with a single process
+        SharedEncryptions.clear(Config.ENCRYPTIONS_PATH)
+
+        print("Server started!")
+
+        PreforkServer(create_server, Config.PROCESSES).start()
+    else:
+        server = create_server()
+        server.start()
+
+        print("Server started!")
+
+        # Stop gracefully on Ctrl+C or when the process is terminated
+        stop_requested = threading.Event()
+        signal.signal(signal.SIGINT, lambda *_: stop_requested.set())
+        signal.signal(signal.SIGTERM, lambda *_: stop_requested.set())
+        signal.signal(signal.SIGUSR1, lambda *_: server.profiler.toggle())
+
+        while server.server_thread.is_alive() and not stop_requested.wait(1):
+            pass
+
+        server.stop()
+
+
+if __name__ == "__main__":
+    run()
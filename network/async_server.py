@@ -0,0 +1,309 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .client import AsyncClient
+from .encryption.shared_encryptions import Encryptions
+from .parser import ParseError
+from .profiler import Profiler
+from .protocol import HTTPMethod
+from .router import Router
+from .server import Server
+from utils.metrics import Metrics
+
+
+class AsyncServer(Server):
+    """
+    A class representing an HTTP server driven by a single asyncio event loop.
+
+    Connections are handled as coroutines on the loop, while blocking endpoint handlers
+    are offloaded to a thread pool executor.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 3339,
+        backlog: int = 100,
+        timeout: float = 1.0,
+        executor_workers: int = 32,
+        keep_alive_timeout: float = 5.0,
+        max_keep_alive_requests: int = 100,
+        receive_buffer_size: int = 16384,
+        reuse_port: bool = False,
+        encryptions: Encryptions | None = None,
+        compression_threshold: int = 1024,
+        compression_level: int = 6,
+        max_header_count: int = 100,
+        max_header_size: int = 8192,
+        max_body_size: int = 1048576,
+        shutdown_timeout: float = 5.0,
+        header_timeout: float = 5.0,
+        body_timeout: float = 10.0,
+        write_timeout: float = 10.0,
+        server_timing: bool = False,
+        cors_max_age: int = 86400,
+        rate_limiting: bool = True,
+        rate_limit_max_keys: int = 100000,
+        profiler: Profiler | None = None,
+    ):
+        """
+        Initializes an AsyncServer instance.
+
+        Args:
+        - host (str): The IP address to bind the server to.
+        - port (int): The port number to bind the server to.
+        - backlog (int): The maximum number of pending connections.
+        - timeout (float): The time in seconds a new connection is given to start sending its first request.
+        - executor_workers (int): The number of threads used to run blocking handlers.
+        - keep_alive_timeout (float): The time in seconds an idle persistent connection is kept open.
+        - max_keep_alive_requests (int): The maximum number of requests served on a single connection.
+        - receive_buffer_size (int): The maximal amount of data read from a client at once.
+        - reuse_port (bool): Whether to let other processes listen on the same port, for pre-forked servers.
+        - encryptions (Encryptions | None): The registry of encryption tokens and keys, a new in-memory registry if not given.
+        - compression_threshold (int): The minimal body size in bytes for responses to be compressed, negative to disable compression.
+        - compression_level (int): The compression level, from 1 (fastest) to 9 (smallest).
+        - max_header_count (int): The maximum number of headers in a request.
+        - max_header_size (int): The maximum size in bytes of a request's line and headers.
+        - max_body_size (int): The maximum size in bytes of a request's body.
+        - shutdown_timeout (float): The time in seconds in-flight requests are given to finish when the server stops.
+        - header_timeout (float): The time in seconds a request's line and headers must be received within, once it starts arriving.
+        - body_timeout (float): The time in seconds a request's body must be received within, once its headers were received.
+        - write_timeout (float): The time in seconds a response must be sent within.
+        - server_timing (bool): Whether to add a Server-Timing header to all responses, rather than only when the client asks for it.
+        - cors_max_age (int): The time in seconds browsers may cache the answers to CORS preflight requests for.
+        - rate_limiting (bool): Whether to enforce the endpoints' rate limits.
+        - rate_limit_max_keys (int): The number of rate limited clients tracked, beyond which idle clients are forgotten.
+        - profiler (Profiler | None): The profiler of live requests, a disabled one if not given.
+        """
+        super().__init__(
+            host=host,
+            port=port,
+            backlog=backlog,
+            workers=0,
+            timeout=timeout,
+            keep_alive_timeout=keep_alive_timeout,
+            max_keep_alive_requests=max_keep_alive_requests,
+            receive_buffer_size=receive_buffer_size,
+            reuse_port=reuse_port,
+            encryptions=encryptions,
+            compression_threshold=compression_threshold,
+            compression_level=compression_level,
+            max_header_count=max_header_count,
+            max_header_size=max_header_size,
+            max_body_size=max_body_size,
+            shutdown_timeout=shutdown_timeout,
+            header_timeout=header_timeout,
+            body_timeout=body_timeout,
+            write_timeout=write_timeout,
+            server_timing=server_timing,
+            cors_max_age=cors_max_age,
+            rate_limiting=rate_limiting,
+            rate_limit_max_keys=rate_limit_max_keys,
+            profiler=profiler,
+        )
+
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=executor_workers, thread_name_prefix="handler"
+        )
+
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.stop_event: asyncio.Event | None = None
+
+        # The connections' tasks, to wait for them or cancel them when the server stops
+        self.tasks: dict[AsyncClient, asyncio.Task] = {}
+        self.drain_timeout: float = shutdown_timeout
+
+    def run(self) -> None:
+        """
+        Runs the event loop until the server is stopped.
+        """
+        asyncio.run(self.serve())
+
+    async def serve(self) -> None:
+        """
+        Serves incoming connections on the event loop until the server is stopped.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+
+        server = await asyncio.start_server(
+            self.handle_connection, sock=self.socket, backlog=self.backlog
+        )
+
+        async with server:
+            await self.stop_event.wait()
+
+            # Stop accepting, and let the in-flight requests finish
+            server.close()
+            await self.drain(self.drain_timeout)
+
+    def stop(self, timeout: float | None = None):
+        """
+        Stops the server gracefully: stops accepting connections, lets the in-flight requests finish
+        until the deadline, and then closes the remaining connections and the event loop.
+
+        Args:
+        - timeout (float | None): The time in seconds in-flight requests are given to finish, the server's shutdown timeout if not given.
+        """
+        if self.has_stopped:
+            return
+
+        self.should_run = False
+        self.has_stopped = True
+        self.drain_timeout = self.shutdown_timeout if timeout is None else timeout
+
+        if self.loop is not None and self.stop_event is not None:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+
+            if threading.current_thread() is not self.server_thread:
+                self.server_thread.join()
+
+        self.executor.shutdown()
+        self.socket.close()
+
+        # Keep the profiles of the requests profiled so far
+        self.profiler.dump()
+
+    async def drain(self, timeout: float) -> None:
+        """
+        Waits for the open connections to close, closing the idle ones right away,
+        and cancels the connections still open after the deadline.
+
+        Args:
+        - timeout (float): The time in seconds to wait for the connections to close.
+        """
+        print(f"Draining {len(self.tasks)} connections...")
+
+        # Connections waiting for another request are closed, the others close after their current request
+        for client in list(self.clients):
+            if not client.active and client.requests_count:
+                client.stop_receiving()
+
+        if not self.tasks:
+            return
+
+        _, pending = await asyncio.wait(list(self.tasks.values()), timeout=timeout)
+
+        for client, task in list(self.tasks.items()):
+            if task in pending:
+                client.abort()
+                task.cancel()
+
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Handles a client connection by receiving and processing incoming requests,
+        for as long as the connection is kept alive.
+
+        Args:
+        - reader (asyncio.StreamReader): The stream to read the client's data from.
+        - writer (asyncio.StreamWriter): The stream to write data to the client.
+        """
+        client = AsyncClient(
+            reader, writer, self.receive_buffer_size, self.create_parser()
+        )
+
+        self.add_client(client)
+        self.tasks[client] = asyncio.current_task()
+
+        try:
+            while True:
+
+                # Getting the request, waiting longer for the first request than for an idle connection
+                try:
+                    request = await client.get_request(
+                        self.keep_alive_timeout if client.requests_count else self.timeout,
+                        self.header_timeout,
+                        self.body_timeout,
+                    )
+                except ParseError as e:
+                    Metrics.increment("puton_parse_errors_total", (("status", str(e.status)),))
+                    await client.send(
+                        self.parse_error_response(e), timeout=self.write_timeout
+                    )
+                    break
+
+                # In case no request was received, close the connection
+                if request is None:
+                    break
+
+                client.active = True
+                started = time.perf_counter()
+
+                # CORS preflights are answered right away, without routing or handling them
+                if request.method == HTTPMethod.OPTIONS:
+                    preflight, keep_alive = self.preflight(request, client)
+                    await client.send_buffers(
+                        [preflight], time.monotonic() + self.write_timeout
+                    )
+                    client.active = False
+
+                    self.record(
+                        request,
+                        self.preflight_endpoint,
+                        self.preflight_response,
+                        len(preflight),
+                        time.perf_counter() - started,
+                    )
+
+                    if not keep_alive:
+                        break
+
+                    continue
+
+                endpoint = Router.not_found
+
+                try:
+                    # Get the right endpoint
+                    endpoint = self.route(request)
+
+                    # Run the endpoint, off the event loop if its handler might block
+                    if endpoint.blocking:
+                        response = await self.loop.run_in_executor(
+                            self.executor, self.handle_request, request, endpoint, client
+                        )
+                    else:
+                        response = self.handle_request(request, endpoint, client)
+
+                    client.requests_count += 1
+
+                    keep_alive = self.keep_alive(request, client.requests_count)
+                    response.set_header(
+                        "Connection", "keep-alive" if keep_alive else "close"
+                    )
+
+                except Exception as e:
+                    keep_alive = False
+                    response = self.internal_error_response(request, endpoint, e)
+
+                # Send the response, closing clients too slow to receive it
+                sending = time.perf_counter()
+                sent = await client.send(response, self.executor, self.write_timeout)
+                request.timings["send"] = time.perf_counter() - sending
+                client.active = False
+
+                self.record(request, endpoint, response, sent, time.perf_counter() - started)
+
+                if not keep_alive:
+                    break
+
+        except asyncio.CancelledError:
+            # The server stopped before the connection's request was handled
+            pass
+
+        except (TimeoutError, ConnectionError):
+            pass
+
+        except Exception as e:
+            print("Error while handling a connection: \n" + str(e))
+
+        finally:
+            # Close the connection, even if handling it failed
+            self.remove_client(client)
+            del self.tasks[client]
+
+            await client.close()
@@ -1,5 +1,9 @@
+from concurrent.futures import Executor
+import asyncio
 import socket
-from .protocol import Response
+import time
+from .protocol import FileResponse, Request, Response, StreamingResponse
+from .parser import ParseError, RequestParser
 
 
 class Client:
@@ -7,59 +11,413 @@ class Client:
     A class representing a client connected to a server.
     """
 
-    def __init__(self, client_socket: socket.socket, client_address: tuple) -> None:
+    def __init__(
+        self,
+        client_socket: socket.socket,
+        client_address: tuple,
+        buffer_size: int = 16384,
+        parser: RequestParser | None = None,
+    ) -> None:
         """
         Initializes the Client instance.
 
         Args:
         - client_socket (socket.socket): The client's socket.
         - client_address (tuple): The client's address (IP address, port).
+        - buffer_size (int): The size of the buffer data is received into.
+        - parser (RequestParser | None): The parser of the client's requests, a parser with the default limits if not given.
         """
         self.client_socket: socket.socket = client_socket
         self.client_address: tuple = client_address
 
-    def send(self, response: Response) -> None:
+        # Whether a request is being handled, and the number of requests handled so far
+        self.active: bool = False
+        self.requests_count: int = 0
+
+        # The received request (or the error parsing it) waiting for a worker
+        self.request: Request | None = None
+        self.error: ParseError | None = None
+
+        # The read deadline while the connection waits for data, and the parser phase it was set for
+        self.deadline: float | None = None
+        self.receiving: str = "idle"
+
+        # A buffer reused by every receive, to avoid allocating a new one per chunk
+        self.receive_buffer: bytearray = bytearray(buffer_size)
+        self.receive_view: memoryview = memoryview(self.receive_buffer)
+
+        # Parses the received data into requests, keeping pipelined ones for later
+        self.parser: RequestParser = parser if parser is not None else RequestParser()
+
+    def send(self, response: Response, timeout: float | None = None) -> int:
         """
         Sends a response to the client.
 
         Args:
         - response (Response): The response to send.
+        - timeout (float | None): The time in seconds the whole response must be sent within, None to wait indefinitely.
+
+        Raises:
+        - TimeoutError: If the client doesn't receive the response in time.
+
+        Returns:
+        - int: The number of bytes sent.
         """
-        self.client_socket.sendall(response.to_http_string().encode())
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        sent = 0
+
+        if isinstance(response, FileResponse):
+            head = response.to_http_head()
+            self.send_buffers([head], deadline)
 
-    def get_data(self, timeout: float = 1) -> str:
+            return len(head) + self.send_file(response, deadline)
+
+        for buffers in response.to_http_buffers():
+            self.send_buffers(buffers, deadline)
+            sent += sum(len(buffer) for buffer in buffers)
+
+        return sent
+
+    def send_file(self, response: FileResponse, deadline: float | None = None) -> int:
         """
-        Receives data from the client.
+        Sends the file of a response with sendfile, copying it from the disk to the socket in the kernel.
 
         Args:
-        - timeout (float): Timeout value in seconds (default is 1 second).
+        - response (FileResponse): The response.
+        - deadline (float | None): The monotonic time the file must be sent by, None to wait indefinitely.
+
+        Raises:
+        - TimeoutError: If the client doesn't receive the file in time.
 
         Returns:
-        - str: The received data as a string.
+        - int: The number of bytes sent.
         """
-        result = ""
+        if not response.count:
+            return 0
 
-        # Set timeout for preventing dDoS attacks
-        self.client_socket.settimeout(timeout)
+        with open(response.path, "rb") as file:
+            self.set_send_timeout(deadline)
 
-        while True:
-            try:
-                chunk = self.client_socket.recv(1024)
-            except socket.timeout:
-                break
+            return self.client_socket.sendfile(file, response.offset, response.count)
 
-            if not chunk:
-                break
+    def send_buffers(self, buffers: list[bytes], deadline: float | None = None) -> None:
+        """
+        Sends several buffers in order with vectored writes, without joining them first.
 
-            result += chunk.decode()
+        Args:
+        - buffers (list[bytes]): The buffers to send.
+        - deadline (float | None): The monotonic time the buffers must be sent by, None to wait indefinitely.
 
-            if "\r\n\r\n" in result:
-                break
+        Raises:
+        - TimeoutError: If the client doesn't receive the buffers in time.
+        """
+        if not hasattr(self.client_socket, "sendmsg"):
+            for buffer in buffers:
+                self.set_send_timeout(deadline)
+                self.client_socket.sendall(buffer)
+
+            return
+
+        views = [memoryview(buffer) for buffer in buffers if buffer]
+
+        while views:
+            self.set_send_timeout(deadline)
+            sent = self.client_socket.sendmsg(views)
+
+            # Drop the fully sent buffers, and the sent part of a partially sent one
+            while sent:
+                if sent >= len(views[0]):
+                    sent -= len(views[0])
+                    views.pop(0)
+                else:
+                    views[0] = views[0][sent:]
+                    sent = 0
+
+    def set_send_timeout(self, deadline: float | None) -> None:
+        """
+        Sets the socket's timeout to the time left until a deadline.
+
+        Args:
+        - deadline (float | None): The monotonic deadline, None to block indefinitely.
+
+        Raises:
+        - TimeoutError: If the deadline has passed.
+        """
+        if deadline is None:
+            self.client_socket.settimeout(None)
+            return
+
+        remaining = deadline - time.monotonic()
+
+        if remaining <= 0:
+            raise TimeoutError("The client didn't receive the response in time")
 
-        return result
+        self.client_socket.settimeout(remaining)
+
+    def receive(self) -> bool:
+        """
+        Receives the data available from the client without blocking, and feeds it to the parser.
+
+        Returns:
+        - bool: False if the client closed the connection, True otherwise.
+        """
+        try:
+            received = self.client_socket.recv_into(self.receive_view)
+        except (BlockingIOError, InterruptedError):
+            return True
+        except OSError:
+            return False
+
+        if not received:
+            return False
+
+        self.parser.feed(self.receive_view[:received])
+
+        return True
+
+    def stop_receiving(self) -> None:
+        """
+        Stops receiving requests from the client, waking up a pending receive, while responses can still be sent.
+        """
+        try:
+            self.client_socket.shutdown(socket.SHUT_RD)
+        except OSError:
+            pass
+
+    def abort(self) -> None:
+        """
+        Shuts the connection down from another thread, interrupting any pending receive or send.
+        The socket is still closed by the thread handling the client.
+        """
+        try:
+            self.client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
 
     def close(self):
         """
         Closes the client socket.
         """
         self.client_socket.close()
+
+
+class AsyncClient:
+    """
+    A class representing a client connected to an asyncio based server.
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        buffer_size: int = 16384,
+        parser: RequestParser | None = None,
+    ) -> None:
+        """
+        Initializes the AsyncClient instance.
+
+        Args:
+        - reader (asyncio.StreamReader): The stream to read the client's data from.
+        - writer (asyncio.StreamWriter): The stream to write data to the client.
+        - buffer_size (int): The maximal amount of data to read at once.
+        - parser (RequestParser | None): The parser of the client's requests, a parser with the default limits if not given.
+        """
+        self.reader: asyncio.StreamReader = reader
+        self.writer: asyncio.StreamWriter = writer
+        self.client_address: tuple = writer.get_extra_info("peername")
+        self.buffer_size: int = buffer_size
+
+        # Whether a request is being handled, and the number of requests handled so far
+        self.active: bool = False
+        self.requests_count: int = 0
+
+        # Parses the received data into requests, keeping pipelined ones for later
+        self.parser: RequestParser = parser if parser is not None else RequestParser()
+
+    async def send(
+        self,
+        response: Response,
+        executor: Executor | None = None,
+        timeout: float | None = None,
+    ) -> int:
+        """
+        Sends a response to the client.
+
+        Args:
+        - response (Response): The response to send.
+        - executor (Executor | None): The executor generating the body of streaming responses, since it might block.
+        - timeout (float | None): The time in seconds the whole response must be sent within, None to wait indefinitely.
+
+        Raises:
+        - TimeoutError: If the client doesn't receive the response in time.
+
+        Returns:
+        - int: The number of bytes sent.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        sent = 0
+
+        if isinstance(response, FileResponse):
+            head = response.to_http_head()
+            self.writer.write(head)
+            await self.drain(deadline)
+
+            return len(head) + await self.send_file(response, deadline)
+
+        if not isinstance(response, StreamingResponse):
+            for buffers in response.to_http_buffers():
+                self.writer.writelines(buffers)
+                sent += sum(len(buffer) for buffer in buffers)
+
+            await self.drain(deadline)
+            return sent
+
+        loop = asyncio.get_running_loop()
+        buffers_iterator = response.to_http_buffers()
+
+        while True:
+            buffers = await loop.run_in_executor(executor, next, buffers_iterator, None)
+
+            if buffers is None:
+                break
+
+            self.writer.writelines(buffers)
+            sent += sum(len(buffer) for buffer in buffers)
+            await self.drain(deadline)
+
+        return sent
+
+    async def send_buffers(self, buffers: list[bytes], deadline: float | None = None) -> None:
+        """
+        Sends several buffers in order, without joining them first.
+
+        Args:
+        - buffers (list[bytes]): The buffers to send.
+        - deadline (float | None): The monotonic time the buffers must be sent by, None to wait indefinitely.
+
+        Raises:
+        - TimeoutError: If the client doesn't receive the buffers in time.
+        """
+        self.writer.writelines(buffers)
+        await self.drain(deadline)
+
+    async def send_file(self, response: FileResponse, deadline: float | None = None) -> int:
+        """
+        Sends the file of a response with the event loop's sendfile, which uses the sendfile system call when the transport supports it.
+
+        Args:
+        - response (FileResponse): The response.
+        - deadline (float | None): The monotonic time the file must be sent by, None to wait indefinitely.
+
+        Raises:
+        - TimeoutError: If the client doesn't receive the file in time.
+
+        Returns:
+        - int: The number of bytes sent.
+        """
+        if not response.count:
+            return 0
+
+        loop = asyncio.get_running_loop()
+
+        with open(response.path, "rb") as file:
+            sending = loop.sendfile(
+                self.writer.transport, file, response.offset, response.count
+            )
+
+            if deadline is None:
+                return await sending
+
+            try:
+                return await asyncio.wait_for(sending, deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                raise TimeoutError("The client didn't receive the response in time")
+
+    async def drain(self, deadline: float | None) -> None:
+        """
+        Waits until the written data was handed to the client's socket.
+
+        Args:
+        - deadline (float | None): The monotonic time the data must be sent by, None to wait indefinitely.
+
+        Raises:
+        - TimeoutError: If the client doesn't receive the data in time.
+        """
+        if deadline is None:
+            await self.writer.drain()
+            return
+
+        try:
+            await asyncio.wait_for(self.writer.drain(), deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            raise TimeoutError("The client didn't receive the response in time")
+
+    async def get_request(
+        self,
+        idle_timeout: float = 1,
+        header_timeout: float = 5.0,
+        body_timeout: float = 10.0,
+    ) -> Request | None:
+        """
+        Receives a single request from the client, returning as soon as it is complete and
+        keeping any data received after it for the following calls.
+
+        Args:
+        - idle_timeout (float): The time in seconds to wait for the request to start arriving.
+        - header_timeout (float): The time in seconds the request's headers must be received within, once it starts arriving.
+        - body_timeout (float): The time in seconds the request's body must be received within, once its headers were received.
+
+        Raises:
+        - ParseError: If the request is malformed or exceeds the parser's limits.
+
+        Returns:
+        - Request | None: The received request, or None if no complete request was received in time.
+        """
+        timeouts = {"idle": idle_timeout, "headers": header_timeout, "body": body_timeout}
+        phase = None
+
+        while True:
+            request = self.parser.next_request()
+
+            if request is not None:
+                return request
+
+            # The deadline is renewed once the request starts arriving, and once its headers were received
+            if self.parser.phase != phase:
+                phase = self.parser.phase
+                deadline = time.monotonic() + timeouts[phase]
+
+            try:
+                chunk = await asyncio.wait_for(
+                    self.reader.read(self.buffer_size), deadline - time.monotonic()
+                )
+            except asyncio.TimeoutError:
+                return None
+
+            if not chunk:
+                return None
+
+            self.parser.feed(chunk)
+
+    def stop_receiving(self) -> None:
+        """
+        Stops receiving requests from the client, waking up a pending read, while responses can still be sent.
+        """
+        self.reader.feed_eof()
+
+    def abort(self) -> None:
+        """
+        Closes the connection right away, discarding any data that wasn't sent yet.
+        """
+        self.writer.transport.abort()
+
+    async def close(self):
+        """
+        Closes the client's stream.
+        """
+        self.writer.close()
+
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
@@ -8,7 +8,7 @@ class Data:
     A class representing data associated with a request.
     """
 
-    def __init__(self, request: Request, db: Database, client, server):
+    def __init__(self, request: Request, db: Database, client, server, endpoint=None):
         """
         Initializes the Data instance.
 
@@ -17,9 +17,11 @@ class Data:
         - db (Database): The database instance.
         - client: The client associated with the request.
         - server: The server handling the request.
+        - endpoint: The endpoint matched for the request.
         """
         self.request = request
         self.db = db
         self.client = client
         self.server = server
+        self.endpoint = endpoint
         self.user = User.default()
@@ -1,5 +1,7 @@
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from typing import Iterable, Iterator
+import binascii
 import hashlib
 
 
@@ -37,6 +39,56 @@ class AES:
 
         return ciphertext.hex()
 
+    @staticmethod
+    def encrypt_bytes(message: bytes, key: str) -> bytes:
+        """
+        Encrypts an already encoded message using AES encryption, without converting it to and from a string.
+
+        Args:
+        - message (bytes): The message to encrypt.
+        - key (str): The encryption key.
+
+        Returns:
+        - bytes: The hexadecimal representation of the encrypted ciphertext.
+        """
+        return b"".join(AES.encrypt_stream([message], key))
+
+    @staticmethod
+    def encrypt_stream(messages: Iterable[str | bytes], key: str) -> Iterator[bytes]:
+        """
+        Encrypts a stream of messages as if they were a single message, using AES encryption.
+
+        Args:
+        - messages (Iterable[str | bytes]): The messages to encrypt.
+        - key (str): The encryption key.
+
+        Returns:
+        - Iterator[bytes]: The hexadecimal representation of the encrypted ciphertext, in pieces.
+        """
+
+        # Create an AES cipher object
+        cipher = Cipher(
+            algorithms.AES(bytes.fromhex(key)),
+            modes.ECB(),
+            backend=default_backend(),
+        )
+
+        encryptor = cipher.encryptor()
+        length = 0
+
+        # Encrypt every message, the encryptor keeps incomplete blocks for the next one
+        for message in messages:
+            data = message.encode() if isinstance(message, str) else message
+            length += len(data)
+
+            yield binascii.hexlify(encryptor.update(data))
+
+        # Pad the whole stream to be a multiple of 16 bytes (AES block size)
+        length_to_pad = 16 - (length % 16)
+        padding = bytes([length_to_pad] * length_to_pad)
+
+        yield binascii.hexlify(encryptor.update(padding) + encryptor.finalize())
+
     @staticmethod
     def decrypt(ciphertext: str, key: str) -> str:
         """
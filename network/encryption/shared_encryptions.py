@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class Encryptions:
+    """
+    An in-memory registry of encryption tokens and keys, optionally forgetting every key some time after it was exchanged.
+    """
+
+    CLEANUP_INTERVAL = 60
+    """
+    The interval in seconds between removals of the expired keys.
+    """
+
+    def __init__(self, ttl: float | None = None) -> None:
+        """
+        Initializes the Encryptions instance.
+
+        Args:
+        - ttl (float | None): The time in seconds a key is valid for after it was exchanged, None for keys that never expire.
+        """
+        self.ttl: float | None = ttl
+
+        # Maps tokens to their key and the monotonic time it expires at, infinity if it never does
+        self.keys: dict[int, tuple[str, float]] = {}
+        self.lock: threading.Lock = threading.Lock()
+        self.next_cleanup: float = time.monotonic() + Encryptions.CLEANUP_INTERVAL
+
+    def __setitem__(self, token: int, key: str) -> None:
+        """
+        Stores the encryption key of a token, replacing any previous key.
+
+        Args:
+        - token (int): The encryption token.
+        - key (str): The encryption key corresponding to the token.
+        """
+        now = time.monotonic()
+
+        with self.lock:
+            self.keys[token] = (key, Encryptions.expiry(now, self.ttl))
+
+            if self.ttl is not None and now >= self.next_cleanup:
+                self.keys = {
+                    token: entry for token, entry in self.keys.items() if entry[1] > now
+                }
+                self.next_cleanup = now + Encryptions.CLEANUP_INTERVAL
+
+    def get(self, token: int) -> str | None:
+        """
+        Retrieves the encryption key of a token.
+
+        Args:
+        - token (int): The encryption token.
+
+        Returns:
+        - str | None: The encryption key corresponding to the token, or None if it has none or it expired.
+        """
+        entry = self.keys.get(token)
+
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+
+        return entry[0]
+
+    @staticmethod
+    def expiry(now: float, ttl: float | None) -> float:
+        """
+        Returns the time a key exchanged now expires at.
+
+        Args:
+        - now (float): The current time.
+        - ttl (float | None): The time in seconds a key is valid for, None for keys that never expire.
+
+        Returns:
+        - float: The expiry time, infinity if the key never expires.
+        """
+        return now + ttl if ttl is not None else float("inf")
+
+
+class SharedEncryptions(Encryptions):
+    """
+    A registry of encryption tokens and keys stored in their own SQLite file, apart from the application's database,
+    so the keys exchanged by one server process can be used by all the others.
+    """
+
+    def __init__(self, path: str, ttl: float | None = None) -> None:
+        """
+        Initializes the SharedEncryptions instance, creating its file and table if needed.
+
+        Args:
+        - path (str): The path of the SQLite file the keys are stored in.
+        - ttl (float | None): The time in seconds a key is valid for after it was exchanged, None for keys that never expire.
+        """
+        super().__init__(ttl)
+
+        # The keys are readable by the server's user only
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            path, timeout=5, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS encryptions (token TEXT PRIMARY KEY, key TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS encryptions_expires ON encryptions (expires)"
+        )
+
+    def __setitem__(self, token: int, key: str) -> None:
+        """
+        Stores the encryption key of a token, replacing any previous key.
+
+        Args:
+        - token (int): The encryption token.
+        - key (str): The encryption key corresponding to the token.
+        """
+        # Wall clock time, since it is compared across processes
+        now = time.time()
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO encryptions (token, key, expires) VALUES (?, ?, ?)",
+                (str(token), key, Encryptions.expiry(now, self.ttl)),
+            )
+
+            if self.ttl is not None and time.monotonic() >= self.next_cleanup:
+                self.connection.execute("DELETE FROM encryptions WHERE expires <= ?", (now,))
+                self.next_cleanup = time.monotonic() + Encryptions.CLEANUP_INTERVAL
+
+    def get(self, token: int) -> str | None:
+        """
+        Retrieves the encryption key of a token.
+
+        Args:
+        - token (int): The encryption token.
+
+        Returns:
+        - str | None: The encryption key corresponding to the token, or None if it has none or it expired.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT key FROM encryptions WHERE token = ? AND expires > ?",
+                (str(token), time.time()),
+            ).fetchone()
+
+        return row[0] if row is not None else None
+
+    @staticmethod
+    def clear(path: str) -> None:
+        """
+        Removes the keys of previous runs, along with the SQLite file they were stored in.
+
+        Args:
+        - path (str): The path of the SQLite file the keys are stored in.
+        """
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
@@ -1,3 +1,4 @@
+from http import HTTPStatus
 from typing import Callable
 from .protocol import Response, HTTPMethod
 from .data import Data
@@ -5,7 +6,7 @@ from .data import Data
 
 class Endpoint:
     """
-    Represents an endpoint with its URL pattern, HTTP method, handler function, and encryption status.
+    Represents an endpoint with its URL pattern, HTTP method, handler function, encryption and blocking status.
     """
 
     def __init__(
@@ -14,6 +15,9 @@ class Endpoint:
         method: HTTPMethod,
         handler: Callable[[Data], Response],
         encrypted: bool = True,
+        blocking: bool = True,
+        converters: dict[str, Callable[[str], object]] = {},
+        rate_limit: tuple[float, float] | None = None,
     ):
         """
         Initializes an Endpoint object.
@@ -23,22 +27,79 @@ class Endpoint:
         - method (HTTPMethod): The HTTP method of the endpoint.
         - handler (Callable[[Data], Response]): The handler function for the endpoint.
         - encrypted (bool): Whether the endpoint requires encryption (default is True).
+        - blocking (bool): Whether the handler may block (e.g. on the database) and must be run off the event loop (default is True).
+          Encrypted endpoints always are, since looking up their key and running AES block as well.
+        - converters (dict[str, Callable[[str], object]]): Converters of path parameters by name (e.g. {"id": int}), raising ValueError for invalid values.
+        - rate_limit (tuple[float, float] | None): The budget of every client as (requests per second, burst size), None for no limit.
         """
         self.url = url
         self.method = method
         self.handler = handler
         self.encrypted = encrypted
+        self.blocking = blocking or encrypted
+        self.rate_limit = rate_limit
+
+        # The index of every path parameter's segment in the URL, with its name and converter
+        self.parameters: list[tuple[int, str, Callable[[str], object]]] = [
+            (i, part[1:], converters.get(part[1:], str))
+            for i, part in enumerate(url.split("/"))
+            if part.startswith(":")
+        ]
+
+    def extract_parameters(self, parts: list[str]) -> dict[str, object] | None:
+        """
+        Extracts the named path parameters out of the segments of a URL matching the endpoint's pattern.
+
+        Args:
+        - parts (list[str]): The segments of the URL.
+
+        Returns:
+        - dict[str, object] | None: The converted path parameters by name, or None if a converter rejected its value.
+        """
+        try:
+            return {
+                name: converter(parts[i]) for i, name, converter in self.parameters
+            }
+        except ValueError:
+            return None
 
     @staticmethod
     def default_endpoint() -> "Endpoint":
         """
-        Creates a default endpoint for handling requests to the root URL with a GET method,
-        responding with an error indicating "Not Found".
+        Creates a default endpoint for handling requests matching no route, responding with an error indicating "Not Found".
+        Its URL pattern is "*", so these requests aren't counted as requests to the root URL.
 
         Returns:
         - Endpoint: A default endpoint instance.
         """
-        return Endpoint("/", HTTPMethod.GET, lambda _: Response.error("Not Found"))
+        return Endpoint("*", HTTPMethod.GET, lambda _: Response.error("Not Found"))
+
+    @staticmethod
+    def preflight_endpoint(max_age: int) -> "Endpoint":
+        """
+        Creates the endpoint answering CORS preflight (OPTIONS) requests to any URL, allowing any origin, header and method.
+        Like the default endpoint its URL pattern is "*".
+
+        Args:
+        - max_age (int): The time in seconds browsers may cache the answer for.
+
+        Returns:
+        - Endpoint: The preflight endpoint instance.
+        """
+        headers = {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "*",
+            "Access-Control-Allow-Methods": "*",
+            "Access-Control-Max-Age": str(max_age),
+        }
+
+        return Endpoint(
+            "*",
+            HTTPMethod.OPTIONS,
+            lambda _: Response(headers, status=HTTPStatus.NO_CONTENT),
+            encrypted=False,
+            blocking=False,
+        )
 
     def __str__(self):
         """
@@ -47,4 +108,4 @@ class Endpoint:
         Returns:
         - str: A string representation of the endpoint.
         """
-        return f"Method: {self.method} URL: {self.url} Encrypted: {self.encrypted} Handler:{self.handler.__name__}"
+        return f"Method: {self.method} URL: {self.url} Encrypted: {self.encrypted} Blocking: {self.blocking} Handler:{self.handler.__name__}"
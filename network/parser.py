@@ -0,0 +1,321 @@
+from urllib.parse import parse_qsl, unquote
+import time
+from .protocol import Headers, HTTPMethod, Request
+
+
+class ParseError(ValueError):
+    """
+    An error raised when a request is malformed or exceeds the parser's limits.
+    """
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        """
+        Initializes the ParseError instance.
+
+        Args:
+        - message (str): The error message.
+        - status (int): The HTTP status code to answer the client with.
+        """
+        super().__init__(message)
+        self.status: int = status
+
+
+class RequestParser:
+    """
+    An incremental HTTP request parser, consuming the data received from a client as it arrives.
+
+    The request line and headers of every request are parsed once, as soon as they are fully received,
+    and are then used to read exactly the request's body, either Content-Length bytes or a chunked body.
+    Data received after a request is kept for the following (pipelined) requests.
+    """
+
+    def __init__(
+        self,
+        max_header_count: int = 100,
+        max_header_size: int = 8192,
+        max_body_size: int = 1048576,
+    ) -> None:
+        """
+        Initializes the RequestParser instance.
+
+        Args:
+        - max_header_count (int): The maximum number of headers in a request.
+        - max_header_size (int): The maximum size in bytes of a request's line and headers.
+        - max_body_size (int): The maximum size in bytes of a request's body.
+        """
+        self.max_header_count: int = max_header_count
+        self.max_header_size: int = max_header_size
+        self.max_body_size: int = max_body_size
+
+        self.buffer: bytearray = bytearray()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Resets the state of the current request, after it was fully received.
+        """
+        self.request: Request | None = None
+        self.body_start: int = -1
+        self.scanned: int = 0
+        self.position: int = 0
+        self.content_length: int = 0
+        self.chunked: bool = False
+        self.chunks: list[bytes] = []
+        self.chunks_size: int = 0
+
+        # The time spent parsing the request, which may take several calls
+        self.parse_time: float = 0
+
+    @property
+    def phase(self) -> str:
+        """
+        Returns what the parser is waiting for.
+
+        Returns:
+        - str: "idle" before a request starts arriving, "headers" while its headers are received, and "body" while its body is.
+        """
+        if self.request is not None:
+            return "body"
+
+        return "headers" if self.buffer else "idle"
+
+    def feed(self, data: bytes | memoryview) -> None:
+        """
+        Adds received data to the buffer.
+
+        Args:
+        - data (bytes | memoryview): The received data.
+        """
+        self.buffer += data
+
+    def copy(self, start: int, end: int) -> bytes:
+        """
+        Copies a part of the buffer, once (slicing the buffer and converting the slice to bytes would copy it twice).
+        The views are released right away, since the buffer can't be resized while they exist.
+
+        Args:
+        - start (int): The position the part starts at.
+        - end (int): The position the part ends at (exclusive).
+
+        Returns:
+        - bytes: The part of the buffer.
+        """
+        with memoryview(self.buffer) as view, view[start:end] as part:
+            return bytes(part)
+
+    def next_request(self) -> Request | None:
+        """
+        Takes the first complete request out of the buffer.
+
+        Raises:
+        - ParseError: If the request is malformed or exceeds the limits.
+
+        Returns:
+        - Request | None: The parsed request, or None if it wasn't fully received yet.
+        """
+        started = time.perf_counter()
+
+        if self.request is None:
+            if not self.read_head():
+                self.parse_time += time.perf_counter() - started
+                return None
+
+        if self.chunked:
+            if not self.read_chunks():
+                self.parse_time += time.perf_counter() - started
+                return None
+
+            body = b"".join(self.chunks)
+            end = self.position
+        else:
+            end = self.body_start + self.content_length
+
+            if len(self.buffer) < end:
+                self.parse_time += time.perf_counter() - started
+                return None
+
+            body = self.copy(self.body_start, end)
+
+        request = self.request
+
+        try:
+            request.body = body.decode()
+        except UnicodeDecodeError:
+            raise ParseError("The request body is not valid UTF-8")
+
+        request.payload = Request.parse_payload(request.body)
+        request.received_bytes = end
+        request.timings["parse"] = self.parse_time + time.perf_counter() - started
+
+        del self.buffer[:end]
+        self.reset()
+
+        return request
+
+    def read_head(self) -> bool:
+        """
+        Parses the request line and headers of the current request, if they were fully received.
+
+        Raises:
+        - ParseError: If the request line or the headers are malformed or exceed the limits.
+
+        Returns:
+        - bool: True if the request line and headers were parsed, False otherwise.
+        """
+
+        # Empty lines before a request are ignored
+        while self.scanned == 0 and self.buffer.startswith(b"\r\n"):
+            del self.buffer[:2]
+
+        headers_end = self.buffer.find(b"\r\n\r\n", self.scanned)
+
+        if headers_end == -1:
+            if len(self.buffer) > self.max_header_size:
+                raise ParseError("The request headers are too large", 431)
+
+            # Don't search the already searched data again, except for a partial terminator
+            self.scanned = max(0, len(self.buffer) - 3)
+            return False
+
+        if headers_end > self.max_header_size:
+            raise ParseError("The request headers are too large", 431)
+
+        lines = self.copy(0, headers_end).split(b"\r\n")
+
+        if len(lines) - 1 > self.max_header_count:
+            raise ParseError("The request has too many headers", 431)
+
+        self.request = self.parse_request_line(lines[0], Headers(lines=lines[1:]))
+
+        for line in lines[1:]:
+            self.parse_framing_header(line)
+
+        self.body_start = headers_end + 4
+        self.position = self.body_start
+
+        return True
+
+    @staticmethod
+    def parse_request_line(line: bytes, headers: Headers) -> Request:
+        """
+        Parses the request line (e.g. "GET /products?page=0 HTTP/1.1") into a request without a body.
+
+        Args:
+        - line (bytes): The request line.
+        - headers (Headers): The request's headers.
+
+        Raises:
+        - ParseError: If the request line is malformed.
+
+        Returns:
+        - Request: The request.
+        """
+        try:
+            method, target, version = line.decode("ascii").split(" ")
+        except (UnicodeDecodeError, ValueError):
+            raise ParseError("Malformed request line")
+
+        if not target or not version.startswith("HTTP/"):
+            raise ParseError("Malformed request line")
+
+        url, _, query_string = target.partition("?")
+
+        return Request(
+            method=HTTPMethod.from_raw(method),
+            url=unquote(url),
+            params=dict(parse_qsl(query_string, keep_blank_values=True)) if query_string else {},
+            headers=headers,
+            version=version,
+        )
+
+    def parse_framing_header(self, line: bytes) -> None:
+        """
+        Validates a header line, and reads it if it is one of the headers framing the request's body.
+
+        Args:
+        - line (bytes): The header line.
+
+        Raises:
+        - ParseError: If the header is malformed, or the body is too large.
+        """
+        key, separator, value = line.partition(b":")
+
+        # Header names can't be empty or contain whitespace, which also rejects obsolete line folding
+        if not separator or not key or key != key.strip():
+            raise ParseError("Malformed header line")
+
+        key = key.lower()
+        value = value.strip()
+
+        if key == b"content-length":
+            if not value.isdigit():
+                raise ParseError("Invalid Content-Length header")
+
+            if int(value) > self.max_body_size:
+                raise ParseError("The request body is too large", 413)
+
+            # The body's length can't be determined from conflicting lengths
+            if self.content_length and self.content_length != int(value):
+                raise ParseError("Conflicting Content-Length headers")
+
+            self.content_length = int(value)
+
+        elif key == b"transfer-encoding":
+            if not value.lower().endswith(b"chunked"):
+                raise ParseError("Unsupported Transfer-Encoding")
+
+            # A chunked body is framed by its chunks, regardless of the Content-Length header
+            self.chunked = True
+
+    def read_chunks(self) -> bool:
+        """
+        Reads the received chunks of a chunked body.
+
+        Raises:
+        - ParseError: If a chunk is malformed, or the body is too large.
+
+        Returns:
+        - bool: True if the whole body was received, False otherwise.
+        """
+        while True:
+            line_end = self.buffer.find(b"\r\n", self.position)
+
+            if line_end == -1:
+                if len(self.buffer) - self.position > self.max_header_size:
+                    raise ParseError("Malformed chunk size")
+
+                return False
+
+            # The chunk's size is in hex, optionally followed by extensions
+            size_field = self.copy(self.position, line_end).split(b";")[0].strip()
+
+            if not size_field or size_field.strip(b"0123456789abcdefABCDEF"):
+                raise ParseError("Malformed chunk size")
+
+            size = int(size_field, 16)
+
+            if self.chunks_size + size > self.max_body_size:
+                raise ParseError("The request body is too large", 413)
+
+            if size == 0:
+                # The last chunk is followed by optional trailers and an empty line
+                trailers_end = self.buffer.find(b"\r\n\r\n", line_end)
+
+                if trailers_end == -1:
+                    return False
+
+                self.position = trailers_end + 4
+                return True
+
+            chunk_start = line_end + 2
+            chunk_end = chunk_start + size
+
+            if len(self.buffer) < chunk_end + 2:
+                return False
+
+            if self.buffer[chunk_end : chunk_end + 2] != b"\r\n":
+                raise ParseError("Malformed chunk")
+
+            self.chunks.append(self.copy(chunk_start, chunk_end))
+            self.chunks_size += size
+            self.position = chunk_end + 2
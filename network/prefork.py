@@ -0,0 +1,150 @@
+from typing import Callable
+from multiprocessing.connection import wait
+import multiprocessing
+import os
+import signal
+import time
+from .server import Server
+
+
+class PreforkServer:
+    """
+    A supervisor running several server processes that share the same listening port.
+
+    Every worker process creates its own server with SO_REUSEPORT, so the kernel balances the
+    incoming connections between them. Workers that exit unexpectedly are restarted.
+    """
+
+    def __init__(
+        self,
+        server_factory: Callable[[], Server],
+        processes: int = 4,
+        restart_delay: float = 1.0,
+        stop_timeout: float = 10.0,
+    ) -> None:
+        """
+        Initializes the PreforkServer instance.
+
+        Args:
+        - server_factory (Callable[[], Server]): Creates the server of a worker process, called inside the worker.
+        - processes (int): The number of worker processes.
+        - restart_delay (float): The time in seconds to wait after restarting crashed workers, to avoid restarting them in a busy loop.
+        - stop_timeout (float): The time in seconds workers are given to stop before they are killed.
+        """
+        self.server_factory: Callable[[], Server] = server_factory
+        self.processes: int = processes
+        self.restart_delay: float = restart_delay
+        self.stop_timeout: float = stop_timeout
+
+        self.context = multiprocessing.get_context("fork")
+        self.workers: list[multiprocessing.Process] = []
+
+        self.should_run: bool = True
+
+    def start(self) -> None:
+        """
+        Starts the worker processes and supervises them until the supervisor is signaled to stop.
+        """
+        signal.signal(signal.SIGINT, self.handle_signal)
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGUSR1, self.forward_signal)
+
+        for _ in range(self.processes):
+            self.workers.append(self.spawn())
+
+        self.supervise()
+        self.stop()
+
+    def spawn(self) -> multiprocessing.Process:
+        """
+        Starts a new worker process.
+
+        Returns:
+        - multiprocessing.Process: The started worker process.
+        """
+        worker = self.context.Process(target=self.run_worker, daemon=True)
+        worker.start()
+
+        return worker
+
+    def run_worker(self) -> None:
+        """
+        The worker process' main function, serving until the process is terminated.
+        """
+
+        # Only the supervisor reacts to Ctrl+C, and it stops the workers itself
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        # The supervisor's handler is inherited, until the server can toggle its own profiler
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+
+        server = self.server_factory()
+        signal.signal(signal.SIGTERM, lambda *_: server.stop())
+        signal.signal(signal.SIGUSR1, lambda *_: server.profiler.toggle())
+
+        server.start()
+
+        if server.server_thread.is_alive():
+            print(f"Worker {multiprocessing.current_process().pid} started!")
+            server.server_thread.join()
+
+    def supervise(self) -> None:
+        """
+        Restarts crashed worker processes until the supervisor is signaled to stop.
+        """
+        while self.should_run:
+            wait([worker.sentinel for worker in self.workers], self.restart_delay)
+
+            if not self.should_run:
+                break
+
+            restarted = False
+
+            for i, worker in enumerate(self.workers):
+                if not worker.is_alive():
+                    print(
+                        f"Worker {worker.pid} exited with code {worker.exitcode}, restarting..."
+                    )
+                    self.workers[i] = self.spawn()
+                    restarted = True
+
+            if restarted:
+                time.sleep(self.restart_delay)
+
+    def stop(self) -> None:
+        """
+        Stops the worker processes, killing the ones that don't stop in time.
+        """
+        self.should_run = False
+
+        for worker in self.workers:
+            if worker.is_alive():
+                worker.terminate()
+
+        for worker in self.workers:
+            worker.join(self.stop_timeout)
+
+            if worker.is_alive():
+                worker.kill()
+
+    def handle_signal(self, signum: int, frame) -> None:
+        """
+        Signal handler asking the supervisor to stop.
+
+        Args:
+        - signum (int): The received signal.
+        - frame: The current stack frame.
+        """
+        self.should_run = False
+
+    def forward_signal(self, signum: int, frame) -> None:
+        """
+        Signal handler forwarding a signal to the worker processes (e.g. SIGUSR1 toggling profiling).
+
+        Args:
+        - signum (int): The received signal.
+        - frame: The current stack frame.
+        """
+        for worker in self.workers:
+            if worker.is_alive():
+                os.kill(worker.pid, signum)
@@ -0,0 +1,167 @@
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import re
+import threading
+from typing import Callable
+
+
+class Profiler:
+    """
+    An opt-in profiler of live requests, aggregating the profiles of every endpoint and writing them to disk.
+
+    When enabled, a sample of the requests is profiled with cProfile, and requests carrying the admin secret in their
+    X-Profile header are always profiled. Only one request is profiled at a time, so concurrent requests are skipped
+    rather than slowed down. The aggregated profiles can be read with pstats or snakeviz.
+    """
+
+    HEADER = "X-Profile"
+    """
+    The request header carrying the admin secret, to profile a single request.
+    """
+
+    def __init__(
+        self,
+        directory: str = "./profiles",
+        sample_rate: float = 0.01,
+        secret: str = "",
+        enabled: bool = False,
+        dump_every: int = 50,
+    ) -> None:
+        """
+        Initializes the Profiler instance.
+
+        Args:
+        - directory (str): The directory the profiles are written to.
+        - sample_rate (float): The fraction of requests profiled while profiling is enabled.
+        - secret (str): The admin secret requests can send to be profiled, empty to disable the header.
+        - enabled (bool): Whether profiling is enabled from the start.
+        - dump_every (int): The number of profiled requests of an endpoint between writes of its profile.
+        """
+        self.directory: str = directory
+        self.sample_rate: float = sample_rate
+        self.secret: str = secret
+        self.enabled: bool = enabled
+        self.dump_every: int = dump_every
+
+        # Held while a request is profiled
+        self.profiling: threading.Lock = threading.Lock()
+
+        # The aggregated profile and number of profiled requests of every endpoint
+        self.lock: threading.Lock = threading.Lock()
+        self.stats: dict[str, pstats.Stats] = {}
+        self.samples: dict[str, int] = {}
+
+    @property
+    def active(self) -> bool:
+        """
+        Returns whether any request may be profiled.
+
+        Returns:
+        - bool: True if profiling is enabled or requests can ask for it, False otherwise.
+        """
+        return self.enabled or bool(self.secret)
+
+    def should_profile(self, header: str) -> bool:
+        """
+        Decides whether to profile a request.
+
+        Args:
+        - header (str): The request's X-Profile header.
+
+        Returns:
+        - bool: True if the request should be profiled, False otherwise.
+        """
+        if self.enabled and random.random() < self.sample_rate:
+            return True
+
+        return bool(self.secret and header) and hmac.compare_digest(
+            header.encode(), self.secret.encode()
+        )
+
+    def toggle(self) -> None:
+        """
+        Enables profiling, or disables it and writes the profiles to disk. Called when the server is signaled.
+        """
+        self.enabled = not self.enabled
+
+        if self.enabled:
+            print(f"Profiling {self.sample_rate:.1%} of requests...")
+        else:
+            print(f"Profiling stopped, profiles written to {self.directory}")
+            self.dump()
+
+    def profile(self, name: str, func: Callable, *args) -> object:
+        """
+        Runs a function under the profiler, adding its profile to an endpoint's aggregated profile.
+        The function runs without profiling if another request is being profiled.
+
+        Args:
+        - name (str): The endpoint's name.
+        - func (Callable): The function.
+        - *args: The function's arguments.
+
+        Returns:
+        - object: The function's result.
+        """
+        if not self.profiling.acquire(blocking=False):
+            return func(*args)
+
+        profile = cProfile.Profile()
+
+        try:
+            profile.enable()
+
+            try:
+                return func(*args)
+            finally:
+                profile.disable()
+        finally:
+            self.profiling.release()
+            self.add(name, profile)
+
+    def add(self, name: str, profile: cProfile.Profile) -> None:
+        """
+        Adds a request's profile to its endpoint's aggregated profile, writing it to disk every few requests.
+
+        Args:
+        - name (str): The endpoint's name.
+        - profile (cProfile.Profile): The request's profile.
+        """
+        with self.lock:
+            stats = self.stats.get(name)
+
+            if stats is None:
+                self.stats[name] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+
+            self.samples[name] = self.samples.get(name, 0) + 1
+
+            if self.samples[name] % self.dump_every == 0:
+                self.write(name)
+
+    def dump(self) -> None:
+        """
+        Writes the aggregated profiles of all the endpoints to disk.
+        """
+        with self.lock:
+            for name in self.stats:
+                self.write(name)
+
+    def write(self, name: str) -> None:
+        """
+        Writes an endpoint's aggregated profile to disk, named after the endpoint and the process (e.g. GET_product_id.1234.prof),
+        since every pre-forked worker profiles its own requests. The files of several processes can be loaded together with pstats.
+
+        Args:
+        - name (str): The endpoint's name.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        filename = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_") or "root"
+        self.stats[name].dump_stats(
+            os.path.join(self.directory, f"{filename}.{os.getpid()}.prof")
+        )
@@ -1,6 +1,13 @@
+from email.utils import formatdate
 from enum import Enum
-import utils.utils as utils
-import json
+from typing import Iterable, Iterator, Mapping
+from utils.json_codec import JSONCodec
+import gzip
+import hashlib
+import mimetypes
+import os
+import zlib
+from http import HTTPStatus
 
 
 class HTTPMethod(Enum):
@@ -16,19 +23,82 @@ class HTTPMethod(Enum):
     OPTIONS = "OPTIONS"
 
     @staticmethod
-    def from_raw(request: str):
+    def from_raw(request_line: str) -> "HTTPMethod":
         """
-        Extracts the HTTP method from a raw HTTP request string.
+        Extracts the HTTP method from the request line of a raw HTTP request.
 
         Args:
-        - request (str): The raw HTTP request string.
+        - request_line (str): The request line.
 
         Returns:
-        - RequestMethod: The extracted HTTP method.
+        - HTTPMethod: The extracted HTTP method, UNKNOWN for unsupported methods.
         """
-        lines = request.split("\r\n")
-        method = lines[0].split(" ")[0]
-        return HTTPMethod(method)
+        # The methods' names are their values
+        return HTTPMethod.__members__.get(request_line.partition(" ")[0], HTTPMethod.UNKNOWN)
+
+
+class Headers(Mapping[str, str]):
+    """
+    The headers of a request, looked up ignoring the case of their names.
+
+    Headers received from a client are kept as raw lines, and only decoded the first time one of them is accessed.
+    """
+
+    def __init__(self, headers: dict[str, str] = {}, lines: list[bytes] = []) -> None:
+        """
+        Initializes the Headers instance.
+
+        Args:
+        - headers (dict[str, str]): Already decoded headers.
+        - lines (list[bytes]): Raw header lines ("Name: value"), decoded when first needed.
+        """
+        self.lines: list[bytes] = lines
+
+        # The headers by their lowercase names, along with their original names
+        self.values: dict[str, tuple[str, str]] | None = None
+
+        if not lines:
+            self.values = {key.lower(): (key, value) for key, value in headers.items()}
+
+    def materialize(self) -> dict[str, tuple[str, str]]:
+        """
+        Decodes the raw header lines, on first access only.
+
+        Returns:
+        - dict[str, tuple[str, str]]: The headers by their lowercase names, along with their original names.
+        """
+        if self.values is not None:
+            return self.values
+
+        self.values = {}
+
+        for line in self.lines:
+            key, _, value = line.decode("latin-1").partition(":")
+            key = key.strip()
+            value = value.strip()
+
+            # Repeated headers are combined into a single comma separated value
+            if key.lower() in self.values:
+                value = self.values[key.lower()][1] + ", " + value
+
+            self.values[key.lower()] = (key, value)
+
+        return self.values
+
+    def __getitem__(self, key: str) -> str:
+        return self.materialize()[key.lower()][1]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and key.lower() in self.materialize()
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key, _ in self.materialize().values())
+
+    def __len__(self) -> int:
+        return len(self.materialize())
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
 
 
 class Request:
@@ -41,72 +111,144 @@ class Request:
         method: HTTPMethod = HTTPMethod.UNKNOWN,
         url: str = "",
         params: dict[str, str] = {},
-        path_variables: list[str] = [],
+        path_params: dict[str, object] = {},
         body: str = "",
-        headers: dict[str, str] = {},
+        headers: Headers | dict[str, str] = {},
         payload: dict[str, str] = {},
+        version: str = "HTTP/1.1",
     ):
         self.method = method
         self.url = url
         self.params = params
-        self.path_variables = path_variables
+        self.path_params = path_params
         self.body = body
-        self.headers = headers
+        self.headers = headers if isinstance(headers, Headers) else Headers(headers)
         self.payload = payload
+        self.version = version
 
-    @staticmethod
-    def from_raw(request: str) -> "Request":
+        # The size of the request as received, and the duration in seconds of every phase of handling it
+        self.received_bytes: int = 0
+        self.timings: dict[str, float] = {}
+
+        # Identifies the request in the logs and to the client, set once it is handled
+        self.id: str = ""
+
+    def get_header(self, key: str, default: str = "") -> str:
         """
-        Creates a Request object from a raw HTTP request string.
+        Gets a header of the request, ignoring the case of its name.
 
         Args:
-        - request (str): The raw HTTP request string.
+        - key (str): The header key.
+        - default (str): The value to return if the header is missing.
 
         Returns:
-        - Request: The parsed Request object.
+        - str: The header value.
         """
+        return self.headers.get(key, default)
 
-        lines = request.split("\r\n")
-        method = HTTPMethod.from_raw(request)
-        url = lines[0].split(" ")[1]
+    def matches_etag(self, etag: str) -> bool:
+        """
+        Checks whether the client already has the representation with the given ETag, according to its If-None-Match header.
 
-        # Parse path variables
-        path_variables = url[1:].split("/")
+        Args:
+        - etag (str): The current ETag of the requested resource.
 
-        headers = {}
-        params = {}
-        payload = {}
-        body = ""
+        Returns:
+        - bool: True if the client's cached representation is up to date, False otherwise.
+        """
+        if_none_match = self.get_header("If-None-Match")
 
-        # Parse headers
-        for line in lines[1:]:
-            if line == "":  # means that we reached to \r\n\r\n
-                break
+        if not if_none_match:
+            return False
 
-            key, value = line.split(": ", 1)
-            headers[key] = value.strip()
+        if if_none_match.strip() == "*":
+            return True
 
-        # Parse URL parameters
-        if "?" in url:
-            url, query_string = url.split("?", 1)
-            params = dict(param.split("=") for param in query_string.split("&"))
+        # ETags are compared weakly, ignoring the W/ prefix
+        etag = etag.removeprefix("W/")
 
-        # Parse body and payload for POST requests (assuming JSON)
-        if method == HTTPMethod.POST and lines[-1]:
-            body = lines[-1]
+        return any(
+            candidate.strip().removeprefix("W/") == etag
+            for candidate in if_none_match.split(",")
+        )
 
-            if utils.is_json(body):
-                payload = json.loads(body)
+    def byte_range(self, size: int) -> tuple[int, int] | None:
+        """
+        Parses the request's Range header into the first and last byte requested out of a resource.
+        Only single byte ranges are supported, other ranges are ignored and the whole resource is sent.
 
-        return Request(
-            method=method,
-            url=url,
-            params=params,
-            path_variables=path_variables,
-            headers=headers,
-            body=body,
-            payload=payload,
-        )
+        Args:
+        - size (int): The size of the resource in bytes.
+
+        Raises:
+        - ValueError: If the range is outside of the resource.
+
+        Returns:
+        - tuple[int, int] | None: The first and last byte of the range (inclusive), or None to send the whole resource.
+        """
+        unit, _, ranges = self.get_header("Range").partition("=")
+
+        if unit.strip().lower() != "bytes" or "," in ranges:
+            return None
+
+        first, separator, last = (part.strip() for part in ranges.partition("-"))
+
+        # Malformed ranges are ignored
+        if not separator or not (first or last):
+            return None
+
+        if (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+
+        if not first:
+            # A suffix range, asking for the last bytes of the resource
+            if int(last) == 0 or size == 0:
+                raise ValueError("The range is not satisfiable")
+
+            return max(0, size - int(last)), size - 1
+
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+        if start >= size:
+            raise ValueError("The range is not satisfiable")
+
+        if end < start:
+            return None
+
+        return start, end
+
+    def keep_alive(self) -> bool:
+        """
+        Checks whether the client wants the connection to stay open after the response.
+
+        HTTP/1.1 connections are persistent unless the client asks to close them,
+        while HTTP/1.0 connections are closed unless the client asks to keep them alive.
+
+        Returns:
+        - bool: True if the connection should be kept alive, False otherwise.
+        """
+        connection = self.get_header("Connection").lower()
+
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+
+        return connection != "close"
+
+    @staticmethod
+    def parse_payload(body: str) -> dict:
+        """
+        Parses the JSON payload of a request body, only once.
+
+        Args:
+        - body (str): The request body.
+
+        Returns:
+        - dict: The payload, or an empty dictionary if the body isn't a JSON object.
+        """
+        payload = JSONCodec.parse(body, {}) if body else {}
+
+        return payload if isinstance(payload, dict) else {}
 
 
 class Response:
@@ -114,9 +256,63 @@ class Response:
     A class representing an HTTP response.
     """
 
-    def __init__(self, headers: dict[str, str] = {}, body: str | dict = "") -> None:
-        self.headers = headers
-        self.body = json.dumps(body)
+    COMPRESSIONS = ("gzip", "deflate")
+    """
+    The supported content encodings, by order of preference.
+    """
+
+    def __init__(
+        self,
+        headers: dict[str, str] = {},
+        body: str | dict | list = "",
+        status: int = 200,
+    ) -> None:
+        """
+        Initializes the Response instance.
+
+        Args:
+        - headers (dict[str, str]): The response headers.
+        - body (str | dict | list): The data to send as JSON, serialized only when needed.
+        - status (int): The HTTP status code.
+        """
+        self.headers = dict(headers)
+        self.status = status
+        self.data = body
+
+        # The serialized body, kept as bytes from the moment it is created
+        self.content: bytes | None = None
+
+    @property
+    def body(self) -> bytes:
+        """
+        The serialized body of the response, serializing the data as JSON on first access.
+
+        Returns:
+        - bytes: The body.
+        """
+        return self.serialize()
+
+    def serialize(self) -> bytes:
+        """
+        Serializes the data as JSON, unless the body was already serialized or replaced.
+
+        Returns:
+        - bytes: The body.
+        """
+        if self.content is None:
+            self.content = JSONCodec.dumps(self.data)
+
+        return self.content
+
+    @body.setter
+    def body(self, value: bytes) -> None:
+        """
+        Replaces the serialized body of the response (e.g. with its encrypted or compressed form).
+
+        Args:
+        - value (bytes): The new body.
+        """
+        self.content = value
 
     def set_header(self, key: str, value: str):
         """
@@ -128,6 +324,43 @@ class Response:
         """
         self.headers[key] = value
 
+    def to_http_head(self) -> bytes:
+        """
+        Convert the status line and headers of the Response object to bytes.
+
+        Returns:
+        - bytes: The status line and headers, followed by the empty line preceding the body.
+        """
+        try:
+            reason = HTTPStatus(self.status).phrase
+        except ValueError:
+            reason = ""
+
+        header_lines = "".join(
+            [f"{key}: {value}\r\n" for key, value in self.headers.items()]
+        )
+
+        return f"HTTP/1.1 {self.status} {reason}\r\n{header_lines}\r\n".encode("latin-1")
+
+    def to_http_buffers(self) -> Iterator[list[bytes]]:
+        """
+        Convert the Response object to the buffers to send, without joining the headers and the body.
+
+        Returns:
+        - Iterator[list[bytes]]: The buffers of the HTTP response, every list meant to be sent in a single write.
+        """
+        # 204 and 304 responses have no body, the headers of a 304 describe the cached representation
+        if self.status in (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED):
+            yield [self.to_http_head()]
+            return
+
+        body = self.body
+
+        self.set_header("Content-Length", str(len(body)))
+        self.headers.setdefault("Content-Type", "application/json")
+
+        yield [self.to_http_head(), body]
+
     def to_http_string(self) -> str:
         """
         Convert the Response object to an HTTP response string.
@@ -135,23 +368,106 @@ class Response:
         Returns:
         - str: The HTTP response string.
         """
-        self.set_header("Content-Length", str(len(self.body)))
-        self.set_header("Content-Type", "application/json")
-
-        header_lines = "\r\n".join(
-            [f"{key}: {value}" for key, value in self.headers.items()]
+        return "".join(
+            buffer.decode(errors="replace")
+            for buffers in self.to_http_buffers()
+            for buffer in buffers
         )
 
-        response_string = f"HTTP/1.1 200 OK\r\n{header_lines}\r\n\r\n{self.body}"
-        return response_string
+    def compress(self, accept_encoding: str, level: int = 6) -> None:
+        """
+        Compresses the body with the preferred encoding the client accepts, if any.
+
+        Args:
+        - accept_encoding (str): The value of the request's Accept-Encoding header.
+        - level (int): The compression level, from 1 (fastest) to 9 (smallest).
+        """
+        encoding = Response.negotiate_encoding(accept_encoding)
+
+        if encoding is None:
+            return
+
+        if encoding == "gzip":
+            self.body = gzip.compress(self.body, level, mtime=0)
+        else:
+            self.body = zlib.compress(self.body, level)
+
+        self.set_header("Content-Encoding", encoding)
+        self.set_header("Vary", "Accept-Encoding")
 
     @staticmethod
-    def error(data: str | dict | list) -> "Response":
+    def negotiate_encoding(accept_encoding: str) -> str | None:
+        """
+        Chooses the content encoding to use according to an Accept-Encoding header.
+
+        Args:
+        - accept_encoding (str): The value of the Accept-Encoding header.
+
+        Returns:
+        - str | None: The chosen encoding, or None if the client accepts none of the supported ones.
+        """
+        accepted = {}
+
+        for item in accept_encoding.lower().split(","):
+            encoding, _, parameters = item.partition(";")
+            quality = 1.0
+
+            # Encodings might have a quality value, where 0 means not acceptable
+            if parameters.strip().startswith("q="):
+                try:
+                    quality = float(parameters.strip()[2:])
+                except ValueError:
+                    quality = 0
+
+            accepted[encoding.strip()] = quality
+
+        for encoding in Response.COMPRESSIONS:
+            if accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding
+
+        return None
+
+    @staticmethod
+    def etag(*parts: object) -> str:
+        """
+        Creates a weak ETag from the parts a representation depends on (e.g. row versions), without hashing its body.
+        The representation only has to be equivalent for equal parts, since compression may change its bytes.
+
+        Args:
+        - *parts (object): The parts, which must have a stable representation.
+
+        Returns:
+        - str: The ETag.
+        """
+        digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+        return f'W/"{digest}"'
+
+    @staticmethod
+    def not_modified(etag: str) -> "Response":
+        """
+        Creates a 304 Not Modified response, telling the client its cached representation is up to date.
+
+        Args:
+        - etag (str): The ETag of the representation.
+
+        Returns:
+        - Response: The response, without a body.
+        """
+        response = Response(status=HTTPStatus.NOT_MODIFIED)
+        response.set_header("ETag", etag)
+        response.body = b""
+
+        return response
+
+    @staticmethod
+    def error(data: str | dict | list, status: int = 200) -> "Response":
         """
         Creates an error response.
 
         Args:
         - data (str | dict | list): The error data.
+        - status (int): The HTTP status code.
 
         Returns:
         - Response: The error response.
@@ -159,24 +475,28 @@ class Response:
         if isinstance(data, dict):
             return Response(
                 body={"success": False, **data},
+                status=status,
             )
 
         if isinstance(data, list):
             return Response(
                 body={"success": False, "data": data},
+                status=status,
             )
 
         return Response(
             body={"success": False, "message": data},
+            status=status,
         )
 
     @staticmethod
-    def success(data: str | dict | list) -> "Response":
+    def success(data: str | dict | list, status: int = 200) -> "Response":
         """
         Creates a success response.
 
         Args:
         - data (str | dict | list): The success data.
+        - status (int): The HTTP status code.
 
         Returns:
         - Response: The success response.
@@ -184,16 +504,261 @@ class Response:
         if isinstance(data, dict):
             return Response(
                 body={"success": True, **data},
+                status=status,
             )
 
         if isinstance(data, list):
             return Response(
                 body={"success": True, "data": data},
+                status=status,
             )
 
         return Response(
             body={"success": True, "message": data},
+            status=status,
         )
 
     def __str__(self) -> str:
         return self.to_http_string()
+
+
+class StreamingResponse(Response):
+    """
+    A class representing an HTTP response whose body is generated while it is sent,
+    using chunked transfer encoding.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterable[str | bytes],
+        headers: dict[str, str] = {},
+        status: int = 200,
+    ) -> None:
+        """
+        Initializes the StreamingResponse instance.
+
+        Args:
+        - chunks (Iterable[str | bytes]): The pieces of the body, generated lazily.
+        - headers (dict[str, str]): The response headers.
+        - status (int): The HTTP status code.
+        """
+        super().__init__(headers, status=status)
+
+        self.body = b""
+        self.chunks: Iterable[str | bytes] = chunks
+
+    def to_http_buffers(self) -> Iterator[list[bytes]]:
+        """
+        Convert the StreamingResponse object to the buffers to send, generating the body on the way.
+
+        Returns:
+        - Iterator[list[bytes]]: The headers, followed by the body's chunks and the terminating chunk.
+        """
+        self.set_header("Transfer-Encoding", "chunked")
+        self.headers.setdefault("Content-Type", "application/json")
+
+        yield [self.to_http_head()]
+
+        for chunk in self.chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+
+            # An empty chunk would terminate the body
+            if chunk:
+                yield [f"{len(chunk):x}\r\n".encode(), chunk, b"\r\n"]
+
+        yield [b"0\r\n\r\n"]
+
+    def compress(self, accept_encoding: str, level: int = 6) -> None:
+        """
+        Compresses the body while it is generated, with the preferred encoding the client accepts, if any.
+
+        Args:
+        - accept_encoding (str): The value of the request's Accept-Encoding header.
+        - level (int): The compression level, from 1 (fastest) to 9 (smallest).
+        """
+        encoding = Response.negotiate_encoding(accept_encoding)
+
+        if encoding is None:
+            return
+
+        # The window bits select the gzip or the zlib container
+        compressor = zlib.compressobj(level, wbits=31 if encoding == "gzip" else 15)
+        self.chunks = StreamingResponse.compress_chunks(self.chunks, compressor)
+
+        self.set_header("Content-Encoding", encoding)
+        self.set_header("Vary", "Accept-Encoding")
+
+    @staticmethod
+    def compress_chunks(chunks: Iterable[str | bytes], compressor) -> Iterator[bytes]:
+        """
+        Compresses a stream of chunks.
+
+        Args:
+        - chunks (Iterable[str | bytes]): The chunks to compress.
+        - compressor: The zlib compression object to use.
+
+        Returns:
+        - Iterator[bytes]: The compressed chunks.
+        """
+        for chunk in chunks:
+            yield compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+
+        yield compressor.flush()
+
+    @staticmethod
+    def success(items: Iterable) -> "StreamingResponse":
+        """
+        Creates a success response streaming a list, encoding every item only when it is sent.
+
+        Args:
+        - items (Iterable): The items of the list.
+
+        Returns:
+        - StreamingResponse: The success response.
+        """
+
+        def chunks() -> Iterator[bytes]:
+            yield b'{"success": true, "data": ['
+
+            for i, item in enumerate(items):
+                yield (b", " if i else b"") + JSONCodec.dumps(item)
+
+            yield b"]}"
+
+        return StreamingResponse(chunks())
+
+
+class FileResponse(Response):
+    """
+    A class representing an HTTP response whose body is (a range of) a file, sent from the disk by the kernel
+    with sendfile where possible, without reading it into memory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        headers: dict[str, str] = {},
+        status: int = 200,
+        offset: int = 0,
+        count: int | None = None,
+    ) -> None:
+        """
+        Initializes the FileResponse instance.
+
+        Args:
+        - path (str): The path of the file.
+        - headers (dict[str, str]): The response headers.
+        - status (int): The HTTP status code.
+        - offset (int): The position in the file the body starts at.
+        - count (int | None): The number of bytes to send, the rest of the file if not given.
+        """
+        super().__init__(headers, status=status)
+
+        self.body = b""
+        self.path: str = path
+        self.offset: int = offset
+        self.count: int = (
+            count if count is not None else os.path.getsize(path) - offset
+        )
+
+        self.set_header("Content-Length", str(self.count))
+        self.headers.setdefault(
+            "Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream"
+        )
+
+    def to_http_buffers(self) -> Iterator[list[bytes]]:
+        """
+        Convert the FileResponse object to the buffers to send, reading the file on the way.
+        Clients supporting sendfile send the head alone and the file with sendfile instead.
+
+        Returns:
+        - Iterator[list[bytes]]: The headers, followed by the file's content.
+        """
+        yield [self.to_http_head()]
+
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            remaining = self.count
+
+            while remaining > 0:
+                chunk = file.read(min(remaining, 65536))
+
+                if not chunk:
+                    break
+
+                remaining -= len(chunk)
+                yield [chunk]
+
+    def compress(self, accept_encoding: str, level: int = 6) -> None:
+        """
+        Files are sent as they are, since they are sent from the disk and are usually compressed already.
+
+        Args:
+        - accept_encoding (str): The value of the request's Accept-Encoding header.
+        - level (int): The compression level, from 1 (fastest) to 9 (smallest).
+        """
+
+    @staticmethod
+    def serve(
+        request: Request, path: str, max_age: int = 0, public: bool = True
+    ) -> Response:
+        """
+        Creates a response serving a file, with caching headers, answering conditional requests with 304
+        and range requests with 206 (or 416 if the range is outside of the file).
+
+        Args:
+        - request (Request): The request for the file.
+        - path (str): The path of the file.
+        - max_age (int): The time in seconds clients may cache the file for without revalidating it.
+        - public (bool): Whether shared caches may keep the file, rather than only the client's own cache.
+
+        Returns:
+        - Response: The response.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return Response.error("File not found!", HTTPStatus.NOT_FOUND)
+
+        # A strong ETag, since the same version of the file is always sent as is
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Cache-Control": f"{'public' if public else 'private'}, max-age={max_age}",
+            "Accept-Ranges": "bytes",
+        }
+
+        if request.matches_etag(etag):
+            response = Response.not_modified(etag)
+            response.headers.update(headers)
+
+            return response
+
+        # A range of an outdated version of the file is not sent, the whole file is
+        if_range = request.get_header("If-Range")
+
+        try:
+            byte_range = (
+                request.byte_range(stat.st_size)
+                if not if_range or if_range == etag
+                else None
+            )
+        except ValueError:
+            response = Response.error(
+                "Range Not Satisfiable", HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+            )
+            response.set_header("Content-Range", f"bytes */{stat.st_size}")
+
+            return response
+
+        if byte_range is None:
+            return FileResponse(path, headers, count=stat.st_size)
+
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+
+        return FileResponse(
+            path, headers, HTTPStatus.PARTIAL_CONTENT, start, end - start + 1
+        )
@@ -0,0 +1,116 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    An in-memory token bucket rate limiter.
+
+    Every key (e.g. a client's IP address on a route) has a bucket holding up to `burst` tokens, refilled at `rate`
+    tokens per second, and every request takes a token. The buckets are spread over several stripes with their own lock,
+    so concurrent requests rarely wait for each other, and the buckets of idle keys are dropped once a stripe is full.
+    """
+
+    STRIPES = 64
+    """
+    The number of independently locked stripes the buckets are spread over.
+    """
+
+    def __init__(self, max_keys: int = 100000) -> None:
+        """
+        Initializes the RateLimiter instance.
+
+        Args:
+        - max_keys (int): The number of buckets kept before the buckets of idle keys are dropped.
+        """
+        self.max_stripe_keys: int = max(1, max_keys // RateLimiter.STRIPES)
+
+        # Every stripe maps keys to [tokens, last refill time, time the bucket is full again]
+        self.locks: list[threading.Lock] = [
+            threading.Lock() for _ in range(RateLimiter.STRIPES)
+        ]
+        self.buckets: list[dict[tuple, list[float]]] = [
+            {} for _ in range(RateLimiter.STRIPES)
+        ]
+
+    def acquire(self, keys: list[tuple], rate: float, burst: float) -> float:
+        """
+        Takes a token out of the buckets of several keys (e.g. a client's IP address and auth token), only if all of them have one,
+        so a request rejected by one bucket doesn't use up the others.
+
+        Args:
+        - keys (list[tuple]): The keys.
+        - rate (float): The number of tokens added to every bucket every second.
+        - burst (float): The maximal number of tokens in every bucket.
+
+        Returns:
+        - float: 0 if the tokens were taken, otherwise the time in seconds until all the buckets have a token again.
+        """
+        # The stripes are locked in order, so concurrent requests can't wait for each other's locks
+        stripes = sorted({hash(key) % RateLimiter.STRIPES for key in keys})
+        now = time.monotonic()
+
+        for stripe in stripes:
+            self.locks[stripe].acquire()
+
+        try:
+            buckets = [self.refill(key, rate, burst, now) for key in keys]
+            wait = max((1 - bucket[0]) / rate for bucket in buckets)
+
+            if wait > 0:
+                return wait
+
+            for bucket in buckets:
+                bucket[0] -= 1
+                bucket[2] = now + (burst - bucket[0]) / rate
+
+            return 0
+
+        finally:
+            for stripe in stripes:
+                self.locks[stripe].release()
+
+    def refill(self, key: tuple, rate: float, burst: float, now: float) -> list[float]:
+        """
+        Returns a key's bucket, refilled with the tokens added since it was last used. The key's stripe must be locked.
+
+        Args:
+        - key (tuple): The key.
+        - rate (float): The number of tokens added to the bucket every second.
+        - burst (float): The maximal number of tokens in the bucket.
+        - now (float): The current monotonic time.
+
+        Returns:
+        - list[float]: The bucket, as [tokens, last refill time, time the bucket is full again].
+        """
+        buckets = self.buckets[hash(key) % RateLimiter.STRIPES]
+        bucket = buckets.get(key)
+
+        if bucket is None:
+            if len(buckets) >= self.max_stripe_keys:
+                self.prune(buckets, now)
+
+            bucket = buckets[key] = [burst, now, now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        return bucket
+
+    @staticmethod
+    def prune(buckets: dict[tuple, list[float]], now: float) -> None:
+        """
+        Drops the buckets that are full again, since a new bucket is the same. If none are, drops the oldest half.
+
+        Args:
+        - buckets (dict[tuple, list[float]]): The buckets of a stripe.
+        - now (float): The current monotonic time.
+        """
+        full = [key for key, bucket in buckets.items() if bucket[2] <= now]
+
+        # Keeping the memory bounded even when all the keys are busy
+        if not full:
+            full = sorted(buckets, key=lambda key: buckets[key][1])[: len(buckets) // 2 + 1]
+
+        for key in full:
+            del buckets[key]
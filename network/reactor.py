@@ -0,0 +1,242 @@
+import heapq
+import itertools
+import queue
+import selectors
+import socket
+import threading
+import time
+from .client import Client
+from .parser import ParseError
+
+
+class Reactor:
+    """
+    A selectors based event loop owning the connections while they wait for or receive a request.
+
+    Connections don't hold a worker until a whole request was received. Every connection has a read deadline
+    depending on what it is waiting for (a new request, the rest of the headers or the body), and
+    connections that miss it are closed. After a response is sent, workers hand kept-alive connections back.
+    """
+
+    ACCEPT = "accept"
+    """
+    The selector data of the listening socket.
+    """
+
+    WAKE = "wake"
+    """
+    The selector data of the socket waking the loop up when connections are handed back.
+    """
+
+    def __init__(self, server) -> None:
+        """
+        Initializes the Reactor instance.
+
+        Args:
+        - server: The server accepting, dispatching and closing the connections, and deciding their read timeouts.
+        """
+        self.server = server
+        self.selector: selectors.BaseSelector = selectors.DefaultSelector()
+
+        # Connections handed back by the workers, and the socket pair waking the loop up for them
+        self.resumed: queue.SimpleQueue = queue.SimpleQueue()
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+
+        # A heap of (deadline, order, client), stale entries are skipped when they are popped
+        self.deadlines: list[tuple[float, int, Client]] = []
+        self.order = itertools.count()
+
+        self.lock = threading.Lock()
+        self.closed: bool = False
+
+        self.server.socket.setblocking(False)
+        self.selector.register(self.server.socket, selectors.EVENT_READ, Reactor.ACCEPT)
+        self.selector.register(self.wake_reader, selectors.EVENT_READ, Reactor.WAKE)
+
+    def run_once(self, timeout: float) -> None:
+        """
+        Waits for socket events and handles them, then closes the connections that missed their deadline.
+
+        Args:
+        - timeout (float): The maximal time in seconds to wait for events.
+        """
+        if self.deadlines:
+            timeout = max(0, min(timeout, self.deadlines[0][0] - time.monotonic()))
+
+        for key, _ in self.selector.select(timeout):
+            if key.data == Reactor.ACCEPT:
+                self.accept()
+            elif key.data == Reactor.WAKE:
+                self.wake_up()
+            else:
+                self.receive(key.data)
+
+        self.expire()
+
+    def accept(self) -> None:
+        """
+        Accepts all the pending connections, and waits for their first request.
+        """
+        while True:
+            try:
+                client = self.server.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+
+            self.watch(client)
+
+    def watch(self, client: Client) -> None:
+        """
+        Waits for a connection's data, until its read deadline.
+
+        Args:
+        - client (Client): The connection.
+        """
+        client.client_socket.setblocking(False)
+        self.selector.register(client.client_socket, selectors.EVENT_READ, client)
+        self.set_deadline(client)
+
+    def unwatch(self, client: Client) -> None:
+        """
+        Stops waiting for a connection's data.
+
+        Args:
+        - client (Client): The connection.
+        """
+        self.selector.unregister(client.client_socket)
+        client.deadline = None
+
+    def set_deadline(self, client: Client) -> None:
+        """
+        Sets a connection's read deadline, according to what it is waiting for.
+
+        Args:
+        - client (Client): The connection.
+        """
+        client.receiving = client.parser.phase
+        client.deadline = time.monotonic() + self.server.read_timeout(client)
+
+        heapq.heappush(self.deadlines, (client.deadline, next(self.order), client))
+
+    def receive(self, client: Client) -> None:
+        """
+        Receives a connection's available data, dispatching its request once it was fully received.
+
+        Args:
+        - client (Client): The connection.
+        """
+        if not client.receive():
+            self.unwatch(client)
+            self.server.close_client(client)
+            return
+
+        self.dispatch_if_ready(client)
+
+    def dispatch_if_ready(self, client: Client) -> bool:
+        """
+        Dispatches a connection's next request to the workers, if it was fully received or is malformed.
+
+        Args:
+        - client (Client): The connection, which must be watched.
+
+        Returns:
+        - bool: True if the connection was dispatched, False otherwise.
+        """
+        try:
+            client.request = client.parser.next_request()
+        except ParseError as e:
+            client.error = e
+
+        if client.request is None and client.error is None:
+            # The deadline is renewed once the request starts arriving, and once its headers were received
+            if client.parser.phase != client.receiving:
+                self.set_deadline(client)
+
+            return False
+
+        self.unwatch(client)
+        self.server.dispatch(client)
+
+        return True
+
+    def expire(self) -> None:
+        """
+        Closes the connections that missed their read deadline.
+        """
+        now = time.monotonic()
+
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, _, client = heapq.heappop(self.deadlines)
+
+            # The connection was dispatched or got a new deadline since
+            if client.deadline != deadline:
+                continue
+
+            self.unwatch(client)
+            self.server.close_client(client)
+
+    def resume(self, client: Client) -> bool:
+        """
+        Hands a connection back after its response was sent, to wait for its next request. Called by the workers.
+
+        Args:
+        - client (Client): The connection.
+
+        Returns:
+        - bool: True if the connection was handed back, False if the reactor is closed.
+        """
+        with self.lock:
+            if self.closed:
+                return False
+
+            self.resumed.put(client)
+
+        self.wake()
+
+        return True
+
+    def wake(self) -> None:
+        """
+        Wakes the loop up from waiting for events.
+        """
+        try:
+            self.wake_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            # The loop is already going to wake up, or is closed
+            pass
+
+    def wake_up(self) -> None:
+        """
+        Watches the connections handed back by the workers, dispatching right away the ones with a pipelined request.
+        """
+        try:
+            while self.wake_reader.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+        while not self.resumed.empty():
+            client = self.resumed.get_nowait()
+
+            self.watch(client)
+            self.dispatch_if_ready(client)
+
+    def close(self) -> None:
+        """
+        Closes the loop, along with the connections waiting for or receiving a request.
+        """
+        with self.lock:
+            self.closed = True
+
+        while not self.resumed.empty():
+            self.server.close_client(self.resumed.get_nowait())
+
+        for key in list(self.selector.get_map().values()):
+            if isinstance(key.data, Client):
+                self.server.close_client(key.data)
+
+        self.selector.close()
+        self.wake_reader.close()
+        self.wake_writer.close()
@@ -1,25 +1,131 @@
-from typing import Callable
+from typing import Callable, Iterator
 from .protocol import Request, Response, HTTPMethod
 from .endpoint import Endpoint
 from .data import Data
 
 
+class RouteNode:
+    """
+    A node in the segment trie of the parameterized routes of a single HTTP method.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes a RouteNode object.
+        """
+        self.children: dict[str, RouteNode] = {}
+        self.parameter: RouteNode | None = None
+        self.endpoint: Endpoint | None = None
+
+    def match(
+        self, parts: list[str], index: int = 0
+    ) -> tuple[Endpoint, dict[str, object]] | None:
+        """
+        Finds the endpoint matching the URL segments from a given index, preferring static segments over parameters.
+
+        Args:
+        - parts (list[str]): The segments of the request URL.
+        - index (int): The index of the segment this node should match.
+
+        Returns:
+        - tuple[Endpoint, dict[str, object]] | None: The matching endpoint and its path parameters, or None if there is no match.
+        """
+        if index == len(parts):
+            if self.endpoint is None:
+                return None
+
+            # Parameters rejected by their converters don't match the route
+            parameters = self.endpoint.extract_parameters(parts)
+
+            if parameters is None:
+                return None
+
+            return self.endpoint, parameters
+
+        child = self.children.get(parts[index])
+
+        if child is not None:
+            match = child.match(parts, index + 1)
+
+            if match is not None:
+                return match
+
+        if self.parameter is not None:
+            return self.parameter.match(parts, index + 1)
+
+        return None
+
+    def matching(self, parts: list[str], index: int = 0) -> Iterator[Endpoint]:
+        """
+        Finds the endpoints of a trie of static routes whose URL matches the segments of a URL pattern from a given index,
+        a parameter segment matching any segment.
+
+        Args:
+        - parts (list[str]): The segments of the URL pattern.
+        - index (int): The index of the segment this node should match.
+
+        Returns:
+        - Iterator[Endpoint]: The matching endpoints.
+        """
+        if index == len(parts):
+            if self.endpoint is not None:
+                yield self.endpoint
+
+            return
+
+        if parts[index].startswith(":"):
+            for child in self.children.values():
+                yield from child.matching(parts, index + 1)
+
+            return
+
+        child = self.children.get(parts[index])
+
+        if child is not None:
+            yield from child.matching(parts, index + 1)
+
+
 class Router:
     """
     A router class to handle routing of HTTP requests to their respective handlers.
+
+    Routes are compiled once when they are registered: static URLs are looked up in a dictionary
+    per HTTP method, and URLs with parameters (e.g. /product/:id) in a segment trie per HTTP method.
+
+    Middlewares are registered the same way, and run in registration order around every endpoint handler.
     """
 
     endpoints: list[Endpoint] = []
+    static_routes: dict[HTTPMethod, dict[str, Endpoint]] = {}
+    dynamic_routes: dict[HTTPMethod, RouteNode] = {}
+
+    # The static routes' segments, to find the ones a new parameterized route matches without scanning them all
+    static_segments: dict[HTTPMethod, RouteNode] = {}
+    middlewares: list[Callable[[Data, Callable[[Data], Response]], Response]] = []
+
+    # The endpoint of requests matching no route, created once
+    not_found: Endpoint = Endpoint.default_endpoint()
 
     @classmethod
-    def route(cls, url: str, method: HTTPMethod, encrypted: bool = True):
+    def route(
+        cls,
+        url: str,
+        method: HTTPMethod,
+        encrypted: bool = True,
+        blocking: bool = True,
+        converters: dict[str, Callable[[str], object]] = {},
+        rate_limit: tuple[float, float] | None = None,
+    ):
         """
         A decorator to register a route with the router.
 
         Args:
-        - url (str): The URL pattern to match against.
+        - url (str): The URL pattern to match against, with named path parameters (e.g. /product/:id).
         - method (HTTPMethod): The HTTP method of the request.
         - encrypted (bool): Whether the route requires encryption (default is True).
+        - blocking (bool): Whether the route handler may block (default is True).
+        - converters (dict[str, Callable[[str], object]]): Converters of path parameters by name (e.g. {"id": int}), the route doesn't match values they reject.
+        - rate_limit (tuple[float, float] | None): The budget of every client as (requests per second, burst size), None for no limit.
 
         Returns:
         - Callable[[Data], Response]: The decorated function.
@@ -27,18 +133,123 @@ class Router:
 
         def decorator(func: Callable[[Data], Response]) -> Callable[[Data], Response]:
             if url.startswith("/"):
-                cls.endpoints.append(Endpoint(url, method, func, encrypted))
+                cls.add_endpoint(
+                    Endpoint(url, method, func, encrypted, blocking, converters, rate_limit)
+                )
             else:
-                cls.endpoints.append(Endpoint("/" + url, method, func, encrypted))
+                cls.add_endpoint(
+                    Endpoint(
+                        "/" + url, method, func, encrypted, blocking, converters, rate_limit
+                    )
+                )
 
             return func
 
         return decorator
 
+    @classmethod
+    def middleware(
+        cls, func: Callable[[Data, Callable[[Data], Response]], Response]
+    ) -> Callable[[Data, Callable[[Data], Response]], Response]:
+        """
+        A decorator to register a middleware, running around the handlers of all the endpoints.
+
+        A middleware gets the request's data and the next step of the chain, which it calls to run the rest of the chain
+        and get its response. It may instead return a response of its own, in which case the handler isn't run.
+
+        Args:
+        - func (Callable[[Data, Callable[[Data], Response]], Response]): The middleware.
+
+        Returns:
+        - Callable[[Data, Callable[[Data], Response]], Response]: The decorated function.
+        """
+        cls.middlewares.append(func)
+
+        return func
+
+    @classmethod
+    def add_endpoint(cls, endpoint: Endpoint) -> None:
+        """
+        Registers an endpoint and compiles its URL into the route tables,
+        reporting routes that conflict with or shadow already registered ones.
+
+        Args:
+        - endpoint (Endpoint): The endpoint to register.
+        """
+        cls.endpoints.append(endpoint)
+
+        if ":" not in endpoint.url:
+            routes = cls.static_routes.setdefault(endpoint.method, {})
+
+            if endpoint.url in routes:
+                cls.report_conflict(endpoint, routes[endpoint.url])
+                return
+
+            routes[endpoint.url] = endpoint
+
+            node = cls.static_segments.setdefault(endpoint.method, RouteNode())
+
+            for part in endpoint.url.split("/"):
+                node = node.children.setdefault(part, RouteNode())
+
+            node.endpoint = endpoint
+
+            # A static route takes precedence over parameterized routes matching the same URL
+            shadowed = cls.dynamic_routes.get(endpoint.method, RouteNode()).match(
+                endpoint.url.split("/")
+            )
+
+            if shadowed is not None:
+                print(
+                    f"Route {endpoint.method.value} {endpoint.url} takes precedence over {shadowed[0].url}"
+                )
+
+            return
+
+        node = cls.dynamic_routes.setdefault(endpoint.method, RouteNode())
+
+        for part in endpoint.url.split("/"):
+            if part.startswith(":"):
+                if node.parameter is None:
+                    node.parameter = RouteNode()
+
+                node = node.parameter
+            else:
+                node = node.children.setdefault(part, RouteNode())
+
+        if node.endpoint is not None:
+            cls.report_conflict(endpoint, node.endpoint)
+            return
+
+        node.endpoint = endpoint
+
+        static_routes = cls.static_segments.get(endpoint.method, RouteNode())
+
+        for static in static_routes.matching(endpoint.url.split("/")):
+            if endpoint.extract_parameters(static.url.split("/")) is not None:
+                print(
+                    f"Route {endpoint.method.value} {static.url} takes precedence over {endpoint.url}"
+                )
+
+    @staticmethod
+    def report_conflict(endpoint: Endpoint, existing: Endpoint) -> None:
+        """
+        Reports an endpoint that is ignored since an existing endpoint matches the exact same requests.
+
+        Args:
+        - endpoint (Endpoint): The ignored endpoint.
+        - existing (Endpoint): The existing endpoint.
+        """
+        print(
+            f"Route {endpoint.method.value} {endpoint.url} ({endpoint.handler.__name__}) "
+            f"conflicts with {existing.url} ({existing.handler.__name__}) and is ignored"
+        )
+
     @classmethod
     def get_endpoint(cls, request: Request) -> Endpoint:
         """
         Handles the incoming request by finding the appropriate endpoint and calling its handler.
+        The named path parameters of the matching route are set as the request's path_params.
 
         Args:
         - request (Request): The incoming request.
@@ -46,16 +257,21 @@ class Router:
         Returns:
         - Endpoint: The endpoint matching the request.
         """
+        endpoint = cls.static_routes.get(request.method, {}).get(request.url)
 
-        filtered_endpoints = list(
-            filter(lambda e: e.method == request.method, cls.endpoints)
-        )
+        if endpoint is not None:
+            return endpoint
+
+        routes = cls.dynamic_routes.get(request.method)
+
+        if routes is not None:
+            match = routes.match(request.url.split("/"))
 
-        for endpoint in filtered_endpoints:
-            if cls.urls_match_pattern(endpoint.url, request.url):
+            if match is not None:
+                endpoint, request.path_params = match
                 return endpoint
 
-        return Endpoint.default_endpoint()
+        return cls.not_found
 
     @staticmethod
     def urls_match_pattern(url: str, request_url: str) -> bool:
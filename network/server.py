@@ -1,14 +1,24 @@
+import functools
 import socket
 import threading
-import json
-import utils.utils as utils
+import time
+import uuid
+from http import HTTPStatus
+from typing import Callable
 from .endpoint import Endpoint
 from .router import Router
-from .protocol import Request, Response
-from .client import Client
+from .protocol import HTTPMethod, Request, Response, StreamingResponse
+from .client import AsyncClient, Client
+from .reactor import Reactor
+from .parser import ParseError, RequestParser
+from .profiler import Profiler
+from .rate_limiter import RateLimiter
+from .worker_pool import WorkerPool
 from .data import Data
 from database.database import Database
 from .encryption.AES import AES
+from .encryption.shared_encryptions import Encryptions
+from utils.metrics import Metrics
 
 
 class Server:
@@ -21,8 +31,29 @@ class Server:
         host: str = "127.0.0.1",
         port: int = 3339,
         backlog: int = 5,
-        max_clients: int = 100,
+        workers: int = 16,
+        queue_size: int = 64,
         timeout: float = 1.0,
+        report_interval: float = 0,
+        keep_alive_timeout: float = 5.0,
+        max_keep_alive_requests: int = 100,
+        receive_buffer_size: int = 16384,
+        reuse_port: bool = False,
+        encryptions: Encryptions | None = None,
+        compression_threshold: int = 1024,
+        compression_level: int = 6,
+        max_header_count: int = 100,
+        max_header_size: int = 8192,
+        max_body_size: int = 1048576,
+        shutdown_timeout: float = 5.0,
+        header_timeout: float = 5.0,
+        body_timeout: float = 10.0,
+        write_timeout: float = 10.0,
+        server_timing: bool = False,
+        cors_max_age: int = 86400,
+        rate_limiting: bool = True,
+        rate_limit_max_keys: int = 100000,
+        profiler: Profiler | None = None,
     ):
         """
         Initializes a Server instance.
@@ -31,8 +62,29 @@ class Server:
         - host (str): The IP address to bind the server to.
         - port (int): The port number to bind the server to.
         - backlog (int): The maximum number of pending connections.
-        - max_clients (int): The maximum number of concurrent clients.
-        - timeout (float): The timeout duration for socket operations.
+        - workers (int): The number of worker threads handling requests.
+        - queue_size (int): The maximum number of received requests waiting for a free worker, beyond which they are rejected.
+        - timeout (float): The time in seconds a new connection is given to start sending its first request.
+        - report_interval (float): The interval in seconds between worker pool reports, 0 to disable them.
+        - keep_alive_timeout (float): The time in seconds an idle persistent connection is kept open.
+        - max_keep_alive_requests (int): The maximum number of requests served on a single connection.
+        - receive_buffer_size (int): The size of every client's receive buffer.
+        - reuse_port (bool): Whether to let other processes listen on the same port, for pre-forked servers.
+        - encryptions (Encryptions | None): The registry of encryption tokens and keys, a new in-memory registry if not given.
+        - compression_threshold (int): The minimal body size in bytes for responses to be compressed, negative to disable compression.
+        - compression_level (int): The compression level, from 1 (fastest) to 9 (smallest).
+        - max_header_count (int): The maximum number of headers in a request.
+        - max_header_size (int): The maximum size in bytes of a request's line and headers.
+        - max_body_size (int): The maximum size in bytes of a request's body.
+        - shutdown_timeout (float): The time in seconds in-flight requests are given to finish when the server stops.
+        - header_timeout (float): The time in seconds a request's line and headers must be received within, once it starts arriving.
+        - body_timeout (float): The time in seconds a request's body must be received within, once its headers were received.
+        - write_timeout (float): The time in seconds a response must be sent within.
+        - server_timing (bool): Whether to add a Server-Timing header to all responses, rather than only when the client asks for it.
+        - cors_max_age (int): The time in seconds browsers may cache the answers to CORS preflight requests for.
+        - rate_limiting (bool): Whether to enforce the endpoints' rate limits.
+        - rate_limit_max_keys (int): The number of rate limited clients tracked, beyond which idle clients are forgotten.
+        - profiler (Profiler | None): The profiler of live requests, a disabled one if not given.
         """
         if host == "" or port < 1000:
             return
@@ -42,19 +94,70 @@ class Server:
         self.backlog: int = backlog
 
         self.server_thread: threading.Thread = threading.Thread(target=self.run)
-        self.max_clients: int = max_clients
-        self.clients: list[Client] = []
-        self.threads: list[threading.Thread] = []
+        self.worker_pool: WorkerPool = WorkerPool(
+            self.handle_client, size=workers, queue_size=queue_size
+        )
+        # The open connections, removed as soon as they are closed
+        self.clients: set[Client] = set()
+        self.clients_changed: threading.Condition = threading.Condition()
         self.socket: socket.socket = socket.socket()
 
         self.should_run: bool = True
         self.has_stopped: bool = False
 
         self.timeout = timeout
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_keep_alive_requests = max_keep_alive_requests
+        self.receive_buffer_size = receive_buffer_size
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        self.max_header_count = max_header_count
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.shutdown_timeout = shutdown_timeout
+        self.header_timeout = header_timeout
+        self.body_timeout = body_timeout
+        self.write_timeout = write_timeout
+        self.server_timing = server_timing
+
+        # CORS preflights get the same answer, serialized once for kept alive and for closed connections
+        self.preflight_endpoint: Endpoint = Endpoint.preflight_endpoint(cors_max_age)
+        self.preflight_response: Response = self.preflight_endpoint.handler(None)
+        self.preflights: dict[bool, bytes] = {}
+
+        for keep_alive in (True, False):
+            self.preflight_response.set_header(
+                "Connection", "keep-alive" if keep_alive else "close"
+            )
+            self.preflights[keep_alive] = self.preflight_response.to_http_head()
 
-        self.socket.settimeout(timeout)
-
-        self.encryptions: dict[int, str] = {}
+        self.rate_limiter: RateLimiter | None = (
+            RateLimiter(rate_limit_max_keys) if rate_limiting else None
+        )
+        self.profiler: Profiler = profiler if profiler is not None else Profiler()
+        self.report_interval = report_interval
+        self.last_report: float = time.monotonic()
+
+        # Waits for the connections' requests, created when the server runs
+        self.reactor: Reactor | None = None
+
+        if reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+        self.encryptions: Encryptions = encryptions if encryptions is not None else Encryptions()
+
+        # The server's middlewares, in the order they run, and the composed chain of every endpoint
+        self.middlewares: list[Callable[[Data, Callable[[Data], Response]], Response]] = [
+            self.profile,
+            self.trace,
+            self.cors,
+            self.rate_limit,
+            self.compress,
+            self.encrypt,
+            self.serialize,
+            self.time_handler,
+        ]
+        self.pipelines: dict[Endpoint, Callable[[Data], Response]] = {}
 
     def start(self):
         """
@@ -64,158 +167,811 @@ class Server:
             self.socket.bind((self.host, self.port))
             self.socket.listen(self.backlog)
 
+            self.compose_all()
+
+            self.worker_pool.start()
             self.server_thread.start()
         except Exception as e:
             print("Error while trying to start server: \n" + str(e))
 
     def run(self) -> None:
         """
-        The main server loop that accepts incoming connections and handles them.
+        The main server loop that accepts incoming connections and receives their requests,
+        handing every fully received request to the worker pool.
         """
-        while self.should_run:
-            if len(self.clients) > self.max_clients:
-                print("Max clients reached, waiting for clients to disconnect...")
-                break
+        self.reactor = Reactor(self)
 
+        while self.should_run:
             try:
-                self.accept()
-            except socket.timeout:
-                pass
+                self.reactor.run_once(self.timeout)
+            except OSError as e:
+                print("Error while waiting for connections: \n" + str(e))
+
+            if self.report_interval and (
+                time.monotonic() - self.last_report >= self.report_interval
+            ):
+                self.report()
+
+        # Connections waiting for a request are closed, the ones being handled are drained
+        self.reactor.close()
 
         if not self.has_stopped:
             self.stop()
 
-    def accept(self) -> None:
+    def accept(self) -> Client:
         """
-        Accepts an incoming connection and spawns a new thread to handle it.
+        Accepts an incoming connection.
+
+        Raises:
+        - BlockingIOError: If there is no pending connection.
+
+        Returns:
+        - Client: The accepted client.
         """
         client_socket, client_address = self.socket.accept()
 
-        client = Client(client_socket, client_address)
-        self.clients.append(client)
+        client = Client(
+            client_socket,
+            client_address,
+            self.receive_buffer_size,
+            self.create_parser(),
+        )
+        self.add_client(client)
 
-        t = threading.Thread(target=self.handle_client, args=(client,))
+        return client
 
-        self.threads.append(t)
-        t.start()
+    def dispatch(self, client: Client) -> None:
+        """
+        Queues a client whose request was fully received for the worker pool,
+        rejecting it right away if the pool's queue is full.
 
-    def stop(self):
+        Args:
+        - client (Client): The client.
         """
-        Stops the server by closing all client connections and the main server socket.
+        if not self.worker_pool.submit(client):
+            self.reject(client)
+
+    def read_timeout(self, client) -> float:
+        """
+        Returns the time a client is given to send data, according to what it is waiting for.
+
+        Args:
+        - client: The client connection.
+
+        Returns:
+        - float: The timeout in seconds.
+        """
+        phase = client.parser.phase
+
+        if phase == "body":
+            return self.body_timeout
+
+        if phase == "headers":
+            return self.header_timeout
+
+        # Waiting longer for the next request of a kept-alive connection than for the first one
+        return self.keep_alive_timeout if client.requests_count else self.timeout
+
+    def add_client(self, client) -> None:
+        """
+        Registers an open connection.
+
+        Args:
+        - client: The client connection.
+        """
+        with self.clients_changed:
+            self.clients.add(client)
+
+    def close_client(self, client) -> None:
+        """
+        Closes a connection and unregisters it.
+
+        Args:
+        - client: The client connection.
+        """
+        self.remove_client(client)
+        client.close()
+
+    def remove_client(self, client) -> None:
         """
+        Unregisters a closed connection, notifying the server if it is draining.
+
+        Args:
+        - client: The client connection.
+        """
+        with self.clients_changed:
+            self.clients.discard(client)
+            self.clients_changed.notify_all()
+
+    def connection_counts(self) -> dict[str, int]:
+        """
+        Returns the number of live connections.
+
+        Returns:
+        - dict[str, int]: The number of open connections, the ones handling a request and the idle ones.
+        """
+        with self.clients_changed:
+            active = sum(1 for client in self.clients if client.active)
+
+            return {
+                "open": len(self.clients),
+                "active": active,
+                "idle": len(self.clients) - active,
+            }
+
+    def create_parser(self) -> RequestParser:
+        """
+        Creates the request parser of a new client, with the server's limits.
+
+        Returns:
+        - RequestParser: The created parser.
+        """
+        return RequestParser(
+            max_header_count=self.max_header_count,
+            max_header_size=self.max_header_size,
+            max_body_size=self.max_body_size,
+        )
+
+    def reject(self, client: Client) -> None:
+        """
+        Rejects a client with a fast error response when the server is overloaded.
+        The response is sent with a single non-blocking write, since it runs on the reactor's thread.
+
+        Args:
+        - client (Client): The client to reject.
+        """
+        response = Response.error("Server is busy, please try again later", status=503)
+        response.set_header("Connection", "close")
+
+        try:
+            client.client_socket.setblocking(False)
+            client.client_socket.send(
+                b"".join(buffer for buffers in response.to_http_buffers() for buffer in buffers)
+            )
+        except OSError:
+            # Including BlockingIOError, a client that can't receive it right away isn't waited for
+            pass
+
+        self.close_client(client)
+
+    def report(self) -> None:
+        """
+        Prints the worker pool's queue depth and wait time statistics.
+        """
+        self.last_report = time.monotonic()
+
+        stats = self.worker_pool.stats()
+        connections = self.connection_counts()
+
+        print(
+            f"Connections: {connections['open']} "
+            f"(active: {connections['active']}, idle: {connections['idle']}) "
+            f"Queue depth: {stats['queueDepth']} "
+            f"Processed: {stats['processed']} "
+            f"Rejected: {stats['rejected']} "
+            f"Average wait: {stats['averageWait'] * 1000:.2f}ms "
+            f"Max wait: {stats['maxWait'] * 1000:.2f}ms"
+        )
+
+    def stop(self, timeout: float | None = None):
+        """
+        Stops the server gracefully: stops accepting connections, lets the in-flight requests finish
+        until the deadline, and then closes the remaining connections.
+
+        Args:
+        - timeout (float | None): The time in seconds in-flight requests are given to finish, the server's shutdown timeout if not given.
+        """
+        if self.has_stopped:
+            return
+
         self.should_run = False
         self.has_stopped = True
 
-        for thread in self.threads:
-            thread.join()
+        # Stop accepting, and close the connections waiting for a request
+        if (
+            self.server_thread.is_alive()
+            and threading.current_thread() is not self.server_thread
+        ):
+            if self.reactor is not None:
+                self.reactor.wake()
+
+            self.server_thread.join()
 
         self.socket.close()
 
+        self.drain(self.shutdown_timeout if timeout is None else timeout)
+        self.worker_pool.stop(timeout=self.timeout)
+
+        # Keep the profiles of the requests profiled so far
+        self.profiler.dump()
+
+    def drain(self, timeout: float) -> None:
+        """
+        Waits for the open connections to close, closing the idle ones right away,
+        and closes the connections still open after the deadline.
+
+        Args:
+        - timeout (float): The time in seconds to wait for the connections to close.
+        """
+        with self.clients_changed:
+            clients = list(self.clients)
+
+        print(f"Draining {len(clients)} connections...")
+
+        # Connections waiting for another request are closed, the others close after their current request
+        for client in clients:
+            if not client.active and client.requests_count:
+                client.stop_receiving()
+
+        with self.clients_changed:
+            self.clients_changed.wait_for(lambda: not self.clients, timeout)
+            clients = list(self.clients)
+
+        for client in clients:
+            client.abort()
+
     def handle_client(self, client: Client) -> None:
         """
-        Handles a client connection by receiving and processing incoming requests.
+        Handles a client's fully received request, and hands the connection back to the reactor
+        to wait for the next request if it is kept alive.
 
         Args:
         - client (Client): The client connection to handle.
         """
+        request, client.request = client.request, None
+        error, client.error = client.error, None
+        keep_alive = False
 
-        # Getting the raw data
-        request_data = client.get_data(self.timeout)
+        try:
+            # Malformed requests are answered right away
+            if error is not None:
+                Metrics.increment("puton_parse_errors_total", (("status", str(error.status)),))
+                client.send(self.parse_error_response(error), self.write_timeout)
+                return
 
-        # In case the data is empty, close the connection and do nothing
-        if request_data == "":
-            client.close()
-            return
+            client.active = True
+            started = time.perf_counter()
+
+            # CORS preflights are answered right away, without routing or handling them
+            if request.method == HTTPMethod.OPTIONS:
+                preflight, keep_alive = self.preflight(request, client)
+                client.send_buffers([preflight], time.monotonic() + self.write_timeout)
+                client.active = False
+
+                self.record(
+                    request,
+                    self.preflight_endpoint,
+                    self.preflight_response,
+                    len(preflight),
+                    time.perf_counter() - started,
+                )
+                return
 
-        # Convert the raw data to a Request object
-        request = Request.from_raw(request_data)
+            endpoint = Router.not_found
 
-        # Get the right endpoint
-        endpoint = Router.get_endpoint(request)
+            try:
+                # Get the right endpoint
+                endpoint = self.route(request)
+
+                # Run the endpoint along with its pre and post processing
+                response = self.handle_request(request, endpoint, client)
+                client.requests_count += 1
+
+                keep_alive = self.keep_alive(request, client.requests_count)
+                response.set_header("Connection", "keep-alive" if keep_alive else "close")
+
+            except Exception as e:
+                keep_alive = False
+                response = self.internal_error_response(request, endpoint, e)
+
+            # Send the response, closing clients too slow to receive it. Streaming responses query the database while sent
+            Metrics.begin_request(request.timings)
+            sending = time.perf_counter()
+
+            try:
+                sent = client.send(response, self.write_timeout)
+            finally:
+                Metrics.end_request()
+
+            request.timings["send"] = time.perf_counter() - sending
+            client.active = False
+
+            self.record(request, endpoint, response, sent, time.perf_counter() - started)
+
+        except (TimeoutError, ConnectionError):
+            keep_alive = False
+
+        finally:
+            # Close the connection unless it is kept alive, even if handling it failed
+            if not (keep_alive and self.reactor.resume(client)):
+                self.close_client(client)
+
+    def preflight(self, request: Request, client: Client | AsyncClient) -> tuple[bytes, bool]:
+        """
+        Answers a CORS preflight request, from the precomputed answers.
+
+        Args:
+        - request (Request): The preflight (OPTIONS) request.
+        - client (Client | AsyncClient): The client that sent the request.
+
+        Returns:
+        - tuple[bytes, bool]: The answer to send, and whether the connection is kept alive after it.
+        """
+        client.requests_count += 1
+        keep_alive = self.keep_alive(request, client.requests_count)
+
+        return self.preflights[keep_alive], keep_alive
+
+    @staticmethod
+    def internal_error_response(
+        request: Request, endpoint: Endpoint, error: Exception
+    ) -> Response:
+        """
+        Creates the response to a request whose routing or handling failed, closing the connection
+        since the failure might have left it in an unknown state.
+
+        Args:
+        - request (Request): The request that failed.
+        - endpoint (Endpoint): The endpoint the request was routed to, the default endpoint if routing failed.
+        - error (Exception): The error raised while handling the request.
+
+        Returns:
+        - Response: The error response.
+        """
+        Metrics.increment("puton_request_errors_total", (("endpoint", endpoint.url),))
+        print(f"Error while handling request {request.id} to {endpoint.url}: {error!r}")
+
+        response = Response.error("Internal Server Error", status=HTTPStatus.INTERNAL_SERVER_ERROR)
+        response.set_header("Connection", "close")
+
+        return response
+
+    @staticmethod
+    def parse_error_response(error: ParseError) -> Response:
+        """
+        Creates the response to a malformed request, closing the connection since the following requests can't be framed.
+
+        Args:
+        - error (ParseError): The error raised while parsing the request.
+
+        Returns:
+        - Response: The error response.
+        """
+        response = Response.error(str(error), status=error.status)
+        response.set_header("Connection", "close")
+
+        return response
 
-        # Pre-processing logic before handling a request
-        response = self.before_handle(request, endpoint)
+    def keep_alive(self, request: Request, requests_count: int) -> bool:
+        """
+        Checks whether a connection should be kept open after responding to a request.
 
-        # Run the endpoint handler
-        response = endpoint.handler(
-            Data(request, Database.get_instance(), client, self)
+        Args:
+        - request (Request): The request that was just handled.
+        - requests_count (int): The number of requests handled on the connection so far.
+
+        Returns:
+        - bool: True if the connection should be kept alive, False otherwise.
+        """
+        return (
+            self.should_run
+            and requests_count < self.max_keep_alive_requests
+            and request.keep_alive()
         )
 
-        # Post-processing logic after handling a request
-        response = self.after_handle(request, response, endpoint)
+    def handle_request(self, request: Request, endpoint: Endpoint, client) -> Response:
+        """
+        Runs the endpoint's middleware chain and handler for a parsed request.
+
+        Args:
+        - request (Request): The incoming request.
+        - endpoint (Endpoint): The matched endpoint for the request.
+        - client: The client connection the request came from.
+
+        Returns:
+        - Response: The response to send back to the client.
+        """
+        Metrics.begin_request(request.timings)
 
-        # Send the response
-        client.send(response)
+        try:
+            return self.pipeline(endpoint)(
+                Data(request, Database.get_instance(), client, self, endpoint)
+            )
 
-        # Close the connection
-        self.clients.remove(client)
-        client.close()
+        finally:
+            Metrics.end_request()
 
-    def before_handle(self, request: Request, endpoint: Endpoint) -> None:
+    def use(
+        self,
+        middleware: Callable[[Data, Callable[[Data], Response]], Response],
+        index: int | None = None,
+    ) -> None:
         """
-        Pre-processing logic before handling a request.
+        Adds a middleware to the server's chain, which runs before the middlewares registered with the router.
+
+        Args:
+        - middleware (Callable[[Data, Callable[[Data], Response]], Response]): The middleware.
+        - index (int | None): The position of the middleware in the chain, the end of the server's chain if not given.
+        """
+        if index is None:
+            self.middlewares.append(middleware)
+        else:
+            self.middlewares.insert(index, middleware)
+
+        # The chains are composed again with the new middleware
+        self.pipelines = {}
+
+    def compose(self, endpoint: Endpoint) -> Callable[[Data], Response]:
+        """
+        Composes an endpoint's handler with the server's middlewares and the ones registered with the router.
+
+        Args:
+        - endpoint (Endpoint): The endpoint.
+
+        Returns:
+        - Callable[[Data], Response]: The chain, running every middleware in order and then the handler.
+        """
+        pipeline = endpoint.handler
+
+        for middleware in reversed(self.middlewares + Router.middlewares):
+            pipeline = functools.partial(middleware, call_next=pipeline)
+
+        return pipeline
+
+    def compose_all(self) -> None:
+        """
+        Composes the chains of all the registered endpoints, so requests don't compose them.
+        """
+        self.pipelines = {
+            endpoint: self.compose(endpoint)
+            for endpoint in Router.endpoints + [Router.not_found]
+        }
+
+    def pipeline(self, endpoint: Endpoint) -> Callable[[Data], Response]:
+        """
+        Returns an endpoint's chain, composing it if the endpoint was registered after the server started.
+
+        Args:
+        - endpoint (Endpoint): The endpoint.
+
+        Returns:
+        - Callable[[Data], Response]: The chain.
+        """
+        pipeline = self.pipelines.get(endpoint)
+
+        if pipeline is None:
+            pipeline = self.pipelines[endpoint] = self.compose(endpoint)
+
+        return pipeline
+
+    def route(self, request: Request) -> Endpoint:
+        """
+        Gets the endpoint matching a request, timing the lookup.
 
         Args:
         - request (Request): The incoming request.
+
+        Returns:
+        - Endpoint: The matched endpoint, or the default endpoint if none matched.
+        """
+        started = time.perf_counter()
+        endpoint = Router.get_endpoint(request)
+        request.timings["route"] = time.perf_counter() - started
+
+        return endpoint
+
+    def record(
+        self,
+        request: Request,
+        endpoint: Endpoint,
+        response: Response,
+        sent: int,
+        duration: float,
+    ) -> None:
+        """
+        Records the metrics of a handled request.
+
+        Args:
+        - request (Request): The handled request, along with its timings.
         - endpoint (Endpoint): The matched endpoint for the request.
+        - response (Response): The response sent back to the client.
+        - sent (int): The number of bytes sent.
+        - duration (float): The time in seconds it took to handle the request and send the response.
         """
+        labels = (("endpoint", endpoint.url),)
 
-        # Check if the data needs to be decrypted
-        if endpoint.encrypted:
+        Metrics.increment(
+            "puton_requests_total",
+            labels + (("method", request.method.value), ("status", str(response.status))),
+        )
+        Metrics.increment("puton_received_bytes_total", labels, request.received_bytes)
+        Metrics.increment("puton_sent_bytes_total", labels, sent)
 
-            # Getting the encryptionToken from the client
-            encryption_token = int(request.headers.get("encryptionToken") or 0)
+        for phase, seconds in request.timings.items():
+            if phase == "db":
+                Metrics.observe("puton_db_duration_seconds", labels, seconds)
+            else:
+                Metrics.observe("puton_request_duration_seconds", labels + (("phase", phase),), seconds)
 
-            # If the encryption token is not valid, do nothing
-            if not encryption_token or not self.already_encrypted(encryption_token):
-                return
+        Metrics.observe("puton_request_duration_seconds", labels + (("phase", "total"),), duration)
+
+    def gauges(self) -> dict[tuple, float]:
+        """
+        Returns the current values of the server's gauges, to export along with the recorded metrics.
+
+        Returns:
+        - dict[tuple, float]: The gauges' values by (name, labels).
+        """
+        connections = self.connection_counts()
+        stats = self.worker_pool.stats()
+
+        gauges = {
+            ("puton_connections", (("state", state),)): count
+            for state, count in connections.items()
+            if state != "open"
+        }
+        gauges[("puton_queue_depth", ())] = stats["queueDepth"]
+        gauges[("puton_rejected_requests_total", ())] = stats["rejected"]
+
+        return gauges
+
+    def profile(self, data: Data, call_next: Callable[[Data], Response]) -> Response:
+        """
+        A middleware profiling the rest of the chain for a sample of the requests, when profiling is enabled
+        or the request carries the admin secret. The body of streaming responses is generated while it is sent, so it isn't profiled.
+
+        Args:
+        - data (Data): The request's data.
+        - call_next (Callable[[Data], Response]): The rest of the chain.
+
+        Returns:
+        - Response: The response.
+        """
+        profiler = self.profiler
 
-            # Getting the encryption key corresponding to the encryption token
-            encryption_key = self.get_encryption_key(encryption_token)
+        if not profiler.active or not profiler.should_profile(
+            data.request.get_header(Profiler.HEADER)
+        ):
+            return call_next(data)
 
-            # Decrypt the request body
-            request.body = AES.decrypt(request.body, encryption_key)
+        return profiler.profile(
+            f"{data.endpoint.method.value} {data.endpoint.url}", call_next, data
+        )
+
+    def trace(self, data: Data, call_next: Callable[[Data], Response]) -> Response:
+        """
+        A middleware identifying the request, and adding its ID to the response along with the Server-Timing header
+        if it is enabled or the client asked for it.
+
+        Args:
+        - data (Data): The request's data.
+        - call_next (Callable[[Data], Response]): The rest of the chain.
 
-            # Convert the decrypted body to it's JSON form if possible
-            request.payload = (
-                json.loads(request.body) if utils.is_json(request.body) else {}
+        Returns:
+        - Response: The response.
+        """
+        request = data.request
+
+        # Identify the request, keeping the client's ID to correlate its reports with the server's
+        request.id = self.request_id(request)
+
+        response = call_next(data)
+        response.set_header("X-Request-ID", request.id)
+
+        if self.server_timing or request.get_header("X-Server-Timing") == "1":
+            # The durations are in milliseconds, and only cover the phases done before the response is sent
+            response.set_header(
+                "Server-Timing",
+                ", ".join(
+                    f"{phase};dur={seconds * 1000:.3f}"
+                    for phase, seconds in request.timings.items()
+                ),
             )
 
-    def after_handle(
-        self, request: Request, response: Response, endpoint: Endpoint
-    ) -> Response:
+        return response
+
+    @staticmethod
+    def request_id(request: Request) -> str:
         """
-        Post-processing logic after handling a request.
+        Returns the ID of a request, either the one the client sent in the X-Request-ID header or a new one.
 
         Args:
         - request (Request): The incoming request.
-        - response (Response): The response generated by the endpoint handler.
-        - endpoint (Endpoint): The matched endpoint for the request.
 
         Returns:
-        - Response: The processed response.
+        - str: The request ID.
+        """
+        request_id = request.get_header("X-Request-ID")
+
+        # Only reasonable IDs are echoed back
+        if 0 < len(request_id) <= 128 and request_id.isascii() and request_id.isprintable():
+            return request_id
+
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def cors(data: Data, call_next: Callable[[Data], Response]) -> Response:
+        """
+        A middleware setting the CORS headers of the response.
+
+        Args:
+        - data (Data): The request's data.
+        - call_next (Callable[[Data], Response]): The rest of the chain.
+
+        Returns:
+        - Response: The response.
         """
+        response = call_next(data)
 
-        # Set CORS headers
         response.set_header("Access-Control-Allow-Origin", "*")
         response.set_header("Access-Control-Allow-Headers", "*")
         response.set_header("Access-Control-Allow-Methods", "*")
 
-        # Check if the data needs to be encrypted
-        if endpoint.encrypted:
+        return response
 
-            # Getting the encryptionToken from the client
-            encryption_token = int(request.headers.get("encryptionToken") or 0)
+    def rate_limit(self, data: Data, call_next: Callable[[Data], Response]) -> Response:
+        """
+        A middleware rejecting requests over their endpoint's budget, before they are decrypted or reach the database.
+        Every client is limited by its IP address, and also by its auth token and encryption token when it sends them.
+
+        Args:
+        - data (Data): The request's data.
+        - call_next (Callable[[Data], Response]): The rest of the chain.
+
+        Returns:
+        - Response: The response.
+        """
+        budget = data.endpoint.rate_limit
+
+        if budget is None or self.rate_limiter is None:
+            return call_next(data)
+
+        rate, burst = budget
+        url = data.endpoint.url
+        headers = data.request.headers
+
+        keys = [(url, "ip", data.client.client_address[0])]
+
+        if headers.get("token"):
+            keys.append((url, "token", headers["token"]))
+
+        if headers.get("encryptionToken"):
+            keys.append((url, "encryptionToken", headers["encryptionToken"]))
+
+        wait = self.rate_limiter.acquire(keys, rate, burst)
+
+        if not wait:
+            return call_next(data)
+
+        Metrics.increment("puton_rate_limited_total", (("endpoint", url),))
+
+        response = Response.error("Too many requests, please try again later", status=429)
+        response.set_header("Retry-After", str(int(wait) + 1))
+
+        # Encrypted endpoints answer encrypted, when the client has a valid encryption token
+        encryption_key = self.request_encryption_key(data.request) if data.endpoint.encrypted else None
+
+        if encryption_key is not None:
+            response.body = AES.encrypt_bytes(response.serialize(), encryption_key)
+
+        return response
+
+    def compress(self, data: Data, call_next: Callable[[Data], Response]) -> Response:
+        """
+        A middleware compressing large responses if the client supports it, streaming responses are assumed to be large.
+
+        Args:
+        - data (Data): The request's data.
+        - call_next (Callable[[Data], Response]): The rest of the chain.
+
+        Returns:
+        - Response: The response.
+        """
+        response = call_next(data)
+
+        if response.status == HTTPStatus.NOT_MODIFIED:
+            return response
+
+        if self.compression_threshold >= 0 and (
+            isinstance(response, StreamingResponse)
+            or self.compression_threshold <= len(response.body)
+        ):
+            started = time.perf_counter()
+            response.compress(
+                data.request.get_header("Accept-Encoding"), self.compression_level
+            )
+            data.request.timings["compress"] = time.perf_counter() - started
+
+        return response
+
+    def encrypt(self, data: Data, call_next: Callable[[Data], Response]) -> Response:
+        """
+        A middleware decrypting the request and encrypting the response of encrypted endpoints,
+        rejecting requests without a valid encryption token before they are handled.
+
+        Args:
+        - data (Data): The request's data.
+        - call_next (Callable[[Data], Response]): The rest of the chain.
+
+        Returns:
+        - Response: The response.
+        """
+        if not data.endpoint.encrypted:
+            return call_next(data)
+
+        request = data.request
+        timings = request.timings
+
+        # Getting the encryption key corresponding to the client's encryption token
+        encryption_key = self.request_encryption_key(request)
+
+        # If the encryption token is not valid, reject the request
+        if encryption_key is None:
+            return Response.error("EncryptionToken is missing or invalid")
+
+        # Decrypt the request body
+        started = time.perf_counter()
+        request.body = AES.decrypt(request.body, encryption_key)
+
+        # Convert the decrypted body to it's JSON form if possible, parsing it only once
+        request.payload = Request.parse_payload(request.body)
+        timings["decrypt"] = time.perf_counter() - started
+
+        response = call_next(data)
+
+        # Not modified responses have no body to encrypt
+        if response.status == HTTPStatus.NOT_MODIFIED:
+            return response
+
+        # Encrypt the response data, while it is generated for streaming responses
+        started = time.perf_counter()
+
+        if isinstance(response, StreamingResponse):
+            response.chunks = AES.encrypt_stream(response.chunks, encryption_key)
+        else:
+            response.body = AES.encrypt_bytes(response.body, encryption_key)
+
+        timings["encrypt"] = time.perf_counter() - started
+
+        return response
+
+    @staticmethod
+    def serialize(data: Data, call_next: Callable[[Data], Response]) -> Response:
+        """
+        A middleware serializing the response data, streaming responses are serialized while they are sent.
 
-            # If the encryption token is not valid, do nothing
-            if not encryption_token or not self.already_encrypted(encryption_token):
-                return Response.error("EncryptionToken is missing or invalid")
+        Args:
+        - data (Data): The request's data.
+        - call_next (Callable[[Data], Response]): The rest of the chain.
+
+        Returns:
+        - Response: The response.
+        """
+        response = call_next(data)
+
+        # Serialized here, before the encrypt and compress layers replace the body, so the serialization is timed on its own
+        if not isinstance(response, StreamingResponse):
+            started = time.perf_counter()
+            response.serialize()
+            data.request.timings["serialize"] = time.perf_counter() - started
+
+        return response
+
+    @staticmethod
+    def time_handler(data: Data, call_next: Callable[[Data], Response]) -> Response:
+        """
+        A middleware timing the endpoint handler, along with the middlewares registered with the router.
 
-            # Getting the encryption key corresponding to the encryption token
-            encryption_key = self.get_encryption_key(encryption_token)
+        Args:
+        - data (Data): The request's data.
+        - call_next (Callable[[Data], Response]): The rest of the chain.
 
-            # Encrypt the response data
-            response.body = AES.encrypt(response.body, encryption_key)
+        Returns:
+        - Response: The response.
+        """
+        started = time.perf_counter()
+        response = call_next(data)
+        data.request.timings["handler"] = time.perf_counter() - started
 
         return response
 
@@ -229,26 +985,31 @@ class Server:
         """
         self.encryptions[token] = key
 
-    def get_encryption_key(self, token: int) -> str:
+    def request_encryption_key(self, request: Request) -> str | None:
         """
-        Retrieves the encryption key associated with a given token.
+        Retrieves the encryption key of the encryption token a request was sent with.
 
         Args:
-        - token (int): The encryption token.
+        - request (Request): The request.
 
         Returns:
-        - str: The encryption key corresponding to the token.
+        - str | None: The encryption key, or None if the request's encryption token is missing or invalid.
         """
-        return self.encryptions[token]
+        try:
+            encryption_token = int(request.headers.get("encryptionToken") or 0)
+        except ValueError:
+            return None
 
-    def already_encrypted(self, token: int) -> bool:
+        return self.get_encryption_key(encryption_token) if encryption_token else None
+
+    def get_encryption_key(self, token: int) -> str | None:
         """
-        Checks if a given token has already been associated with an encryption key.
+        Retrieves the encryption key associated with a given token.
 
         Args:
         - token (int): The encryption token.
 
         Returns:
-        - bool: True if the token is already associated with an encryption key, False otherwise.
+        - str | None: The encryption key corresponding to the token, or None if it has none or it expired.
         """
-        return token in self.encryptions
+        return self.encryptions.get(token)
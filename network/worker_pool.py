@@ -0,0 +1,145 @@
+from typing import Callable
+import queue
+import threading
+import time
+
+
+class WorkerPool:
+    """
+    A fixed-size pool of worker threads fed by a bounded queue of pending jobs.
+    """
+
+    POLL_INTERVAL = 0.5
+    """
+    The interval in seconds idle workers check whether the pool is stopping, in case their stop sentinel didn't fit in the queue.
+    """
+
+    def __init__(self, handler: Callable, size: int = 16, queue_size: int = 64) -> None:
+        """
+        Initializes the WorkerPool instance.
+
+        Args:
+        - handler (Callable): The function the workers call with every submitted job.
+        - size (int): The number of worker threads.
+        - queue_size (int): The maximum number of jobs waiting for a free worker.
+        """
+        self.handler: Callable = handler
+        self.size: int = size
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.workers: list[threading.Thread] = []
+        self.stopping: threading.Event = threading.Event()
+
+        # Statistics about the time jobs spent waiting in the queue
+        self.lock = threading.Lock()
+        self.processed: int = 0
+        self.rejected: int = 0
+        self.total_wait: float = 0
+        self.max_wait: float = 0
+
+    def start(self) -> None:
+        """
+        Starts the worker threads.
+        """
+        self.stopping.clear()
+
+        for i in range(self.size):
+            worker = threading.Thread(target=self.work, name=f"worker-{i}", daemon=True)
+            self.workers.append(worker)
+            worker.start()
+
+    def submit(self, job) -> bool:
+        """
+        Queues a job for the workers without blocking.
+
+        Args:
+        - job: The job to pass to the handler.
+
+        Returns:
+        - bool: True if the job was queued, False if the queue is full.
+        """
+        try:
+            self.queue.put_nowait((job, time.monotonic()))
+        except queue.Full:
+            with self.lock:
+                self.rejected += 1
+
+            return False
+
+        return True
+
+    def work(self) -> None:
+        """
+        The worker loop, handling queued jobs until a stop sentinel is received, or the pool is stopping and no job is left.
+        """
+        while True:
+            try:
+                item = self.queue.get(timeout=WorkerPool.POLL_INTERVAL)
+            except queue.Empty:
+                if self.stopping.is_set():
+                    break
+
+                continue
+
+            # None is the sentinel telling the worker to stop
+            if item is None:
+                break
+
+            job, queued_at = item
+            wait = time.monotonic() - queued_at
+
+            with self.lock:
+                self.processed += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+
+            try:
+                self.handler(job)
+            except Exception as e:
+                print("Error while handling a job: \n" + str(e))
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stops the workers after the already queued jobs are handled, without blocking on a full queue.
+
+        Args:
+        - timeout (float | None): The time in seconds to wait for every worker, None to wait until they finish.
+        """
+        self.stopping.set()
+
+        # The sentinels stop idle workers right away, the others stop once the queue is empty
+        for _ in self.workers:
+            try:
+                self.queue.put_nowait(None)
+            except queue.Full:
+                break
+
+        for worker in self.workers:
+            worker.join(timeout)
+
+        self.workers.clear()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Returns the number of jobs waiting for a free worker.
+
+        Returns:
+        - int: The current queue depth.
+        """
+        return self.queue.qsize()
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Returns statistics about the pool's queue.
+
+        Returns:
+        - dict[str, int | float]: The queue depth, processed and rejected job counts, and the average and maximal queue wait in seconds.
+        """
+        with self.lock:
+            return {
+                "queueDepth": self.queue_depth,
+                "processed": self.processed,
+                "rejected": self.rejected,
+                "averageWait": self.total_wait / self.processed if self.processed else 0,
+                "maxWait": self.max_wait,
+            }
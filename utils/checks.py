@@ -2,8 +2,10 @@ from network.protocol import Request, Response
 from network.encryption.diffie_hellman import DiffieHellmanState
 from database.database import Database
 from typing import Callable
+from .metrics import Metrics
 from .models import User
 from network.data import Data
+import time
 
 
 def register(request: Request) -> bool:
@@ -32,43 +34,62 @@ def login(request: Request) -> bool:
     return "username" in request.payload and "password" in request.payload
 
 
-def product(request: Request) -> bool:
+def wishlist_product(request: Request) -> bool:
     """
-    Validates whether the request contains the necessary parameters for retrieving a product.
+    Validates whether the request contains the necessary payload fields for adding a product to the wishlist.
 
     Args:
     - request (Request): The incoming request.
 
     Returns:
-    - bool: True if the request contains product's id and it's a number, False otherwise.
+    - bool: True if the request contains 'id' field in the payload, False otherwise.
     """
-    return len(request.path_variables) > 1 and (request.path_variables[1]).isdigit()
+    return "id" in request.payload
 
 
-def wishlist_product(request: Request) -> bool:
+def products(request: Request) -> bool:
     """
-    Validates whether the request contains the necessary payload fields for adding a product to the wishlist.
+    Validates whether the request contains the necessary parameters for retrieving products.
 
     Args:
     - request (Request): The incoming request.
 
     Returns:
-    - bool: True if the request contains 'id' field in the payload, False otherwise.
+    - bool: True if the request contains 'amount' and 'page' parameters, False otherwise.
     """
-    return "id" in request.payload
+    return "amount" in request.params and "page" in request.params
 
 
-def products(request: Request) -> bool:
+def product_id(value: str) -> int:
     """
-    Validates whether the request contains the necessary parameters for retrieving products.
+    Converts the product ID path parameter, accepting ASCII digits only (unlike int, which accepts signs, underscores and Unicode digits).
+
+    Args:
+    - value (str): The path parameter.
+
+    Raises:
+    - ValueError: If the parameter is not made of ASCII digits, so the route doesn't match.
+
+    Returns:
+    - int: The product ID.
+    """
+    if not (value.isascii() and value.isdigit()):
+        raise ValueError(f"Invalid product ID: {value!r}")
+
+    return int(value)
+
+
+def image_url(request: Request) -> bool:
+    """
+    Checks whether the client asked for the URLs of the product images instead of the images themselves.
 
     Args:
     - request (Request): The incoming request.
 
     Returns:
-    - bool: True if the request contains 'amount' and 'page' parameters, False otherwise.
+    - bool: True if the request has an 'images=url' parameter, False otherwise.
     """
-    return "amount" in request.params and "page" in request.params
+    return request.params.get("images") == "url"
 
 
 def handshake(request: Request, state: DiffieHellmanState) -> bool:
@@ -103,6 +124,8 @@ def authenticated(handler: Callable[[Data], Response]):
         if not data.request.headers.get("token"):
             return Response.error("Not Authenticated")
 
+        started = time.perf_counter()
+
         user = (
             Database.get_instance()
             .execute(
@@ -112,6 +135,8 @@ def authenticated(handler: Callable[[Data], Response]):
             .fetch_one()
         )
 
+        Metrics.add_timing("auth", time.perf_counter() - started)
+
         if user == None:
             return Response.error("Not Authenticated")
 
@@ -0,0 +1,98 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONCodec:
+    """
+    Encodes and decodes JSON with the configured backend, orjson when it is installed or the standard library.
+    """
+
+    BACKENDS = ("auto", "orjson", "json")
+    """
+    The available backends, "auto" choosing orjson when it is installed.
+    """
+
+    backend: str = "orjson" if orjson is not None else "json"
+
+    @staticmethod
+    def use(backend: str) -> None:
+        """
+        Selects the backend used to encode and decode JSON.
+
+        Args:
+        - backend (str): The backend, either "auto", "orjson" or "json".
+
+        Raises:
+        - ValueError: If the backend is unknown, or orjson is requested but not installed.
+        """
+        if backend not in JSONCodec.BACKENDS:
+            raise ValueError(f"Unknown JSON backend: {backend}")
+
+        if backend == "auto":
+            backend = "orjson" if orjson is not None else "json"
+
+        if backend == "orjson" and orjson is None:
+            raise ValueError("The orjson JSON backend is not installed")
+
+        JSONCodec.backend = backend
+
+    @staticmethod
+    def loads(data: str | bytes) -> object:
+        """
+        Decodes a JSON document.
+
+        Args:
+        - data (str | bytes): The JSON document.
+
+        Raises:
+        - ValueError: If the data is not valid JSON.
+
+        Returns:
+        - object: The decoded value.
+        """
+        if JSONCodec.backend == "orjson":
+            return orjson.loads(data)
+
+        return json.loads(data)
+
+    @staticmethod
+    def parse(data: str | bytes, default: object = None) -> object:
+        """
+        Decodes a JSON document once, without checking its validity beforehand.
+
+        Args:
+        - data (str | bytes): The JSON document.
+        - default (object): The value to return if the data is not valid JSON.
+
+        Returns:
+        - object: The decoded value, or the default if the data is not valid JSON.
+        """
+        try:
+            return JSONCodec.loads(data)
+        except ValueError:
+            return default
+
+    @staticmethod
+    def dumps(value: object) -> bytes:
+        """
+        Encodes a value as a JSON document.
+
+        Args:
+        - value (object): The value to encode.
+
+        Returns:
+        - bytes: The UTF-8 encoded JSON document.
+        """
+        if JSONCodec.backend == "orjson":
+            try:
+                return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+            # orjson doesn't support every value the standard library does (e.g. integers above 64 bits)
+            except TypeError:
+                pass
+
+        return json.dumps(value).encode()
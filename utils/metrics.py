@@ -0,0 +1,214 @@
+from bisect import bisect_left
+import threading
+
+
+class Metrics:
+    """
+    A registry of counters and latency histograms, exported in the Prometheus text format.
+
+    Every thread records into its own shard, so recording never waits on a lock, and the shards are only merged when
+    the metrics are exported. The time spent in the database is attributed to the request the thread is handling.
+    """
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    """
+    The upper bounds in seconds of the latency histograms' buckets.
+    """
+
+    DESCRIPTIONS = {
+        "puton_requests_total": ("counter", "Handled requests by endpoint and status code."),
+        "puton_request_errors_total": ("counter", "Requests whose handling raised an error, by endpoint."),
+        "puton_parse_errors_total": ("counter", "Malformed requests by status code."),
+        "puton_rejected_requests_total": ("counter", "Requests rejected because the server was overloaded."),
+        "puton_rate_limited_total": ("counter", "Requests rejected for exceeding their endpoint's rate limit, by endpoint."),
+        "puton_request_duration_seconds": ("histogram", "Time spent in every phase of handling requests, by endpoint."),
+        "puton_db_duration_seconds": ("histogram", "Time spent in the database per request, by endpoint."),
+        "puton_received_bytes_total": ("counter", "Bytes of requests received, by endpoint."),
+        "puton_sent_bytes_total": ("counter", "Bytes of responses sent, by endpoint."),
+        "puton_connections": ("gauge", "Open connections by state."),
+        "puton_queue_depth": ("gauge", "Requests waiting for a free worker."),
+    }
+    """
+    The type and help text of every metric.
+    """
+
+    shards: list[dict] = []
+    lock = threading.Lock()
+    local = threading.local()
+
+    @classmethod
+    def shard(cls) -> dict:
+        """
+        Returns the calling thread's shard, creating it on the thread's first recording.
+
+        Returns:
+        - dict: The shard, mapping (name, labels) to a counter value or histogram.
+        """
+        shard = getattr(cls.local, "shard", None)
+
+        if shard is None:
+            shard = cls.local.shard = {}
+
+            with cls.lock:
+                cls.shards.append(shard)
+
+        return shard
+
+    @classmethod
+    def increment(cls, name: str, labels: tuple = (), amount: float = 1) -> None:
+        """
+        Increments a counter.
+
+        Args:
+        - name (str): The counter's name.
+        - labels (tuple): The counter's labels, as (name, value) pairs.
+        - amount (float): The amount to add.
+        """
+        shard = cls.shard()
+        key = (name, labels)
+
+        shard[key] = shard.get(key, 0) + amount
+
+    @classmethod
+    def observe(cls, name: str, labels: tuple, value: float) -> None:
+        """
+        Records a value in a histogram.
+
+        Args:
+        - name (str): The histogram's name.
+        - labels (tuple): The histogram's labels, as (name, value) pairs.
+        - value (float): The value, in seconds.
+        """
+        shard = cls.shard()
+        key = (name, labels)
+        histogram = shard.get(key)
+
+        # The buckets' counts (the last one is +Inf), followed by the sum of the values
+        if histogram is None:
+            histogram = shard[key] = [0] * (len(cls.BUCKETS) + 1) + [0.0]
+
+        histogram[bisect_left(cls.BUCKETS, value)] += 1
+        histogram[-1] += value
+
+    @classmethod
+    def begin_request(cls, timings: dict[str, float]) -> None:
+        """
+        Marks the calling thread as handling a request, so the time spent in the database is added to its timings.
+
+        Args:
+        - timings (dict[str, float]): The request's phase durations in seconds.
+        """
+        cls.local.timings = timings
+
+    @classmethod
+    def end_request(cls) -> None:
+        """
+        Marks the calling thread as no longer handling a request.
+        """
+        cls.local.timings = None
+
+    @classmethod
+    def add_timing(cls, phase: str, seconds: float) -> None:
+        """
+        Adds a duration to a phase of the request the calling thread is handling, if any.
+
+        Args:
+        - phase (str): The phase's name.
+        - seconds (float): The duration in seconds.
+        """
+        timings = getattr(cls.local, "timings", None)
+
+        if timings is not None:
+            timings[phase] = timings.get(phase, 0) + seconds
+
+    @classmethod
+    def collect(cls) -> dict[tuple, float | list]:
+        """
+        Merges the shards of all the threads.
+
+        Returns:
+        - dict[tuple, float | list]: The counters' values and histograms by (name, labels).
+        """
+        with cls.lock:
+            shards = list(cls.shards)
+
+        merged = {}
+
+        for shard in shards:
+            # Copying the shard is atomic, while its thread keeps recording
+            for key, value in dict(shard).items():
+                if isinstance(value, list):
+                    total = merged.setdefault(key, [0] * len(value))
+
+                    for i, count in enumerate(value):
+                        total[i] += count
+                else:
+                    merged[key] = merged.get(key, 0) + value
+
+        return merged
+
+    @classmethod
+    def export(cls, gauges: dict[tuple, float] = {}) -> str:
+        """
+        Exports the metrics in the Prometheus text format.
+
+        Args:
+        - gauges (dict[tuple, float]): Current values measured at export time, by (name, labels).
+
+        Returns:
+        - str: The metrics.
+        """
+        metrics = cls.collect()
+        metrics.update(gauges)
+
+        lines = []
+
+        for name, (kind, description) in cls.DESCRIPTIONS.items():
+            keys = sorted(key for key in metrics if key[0] == name)
+
+            if not keys:
+                continue
+
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+
+            for _, labels in keys:
+                value = metrics[(name, labels)]
+
+                if kind != "histogram":
+                    lines.append(f"{name}{cls.format_labels(labels)} {value}")
+                    continue
+
+                # Histogram buckets are cumulative
+                count = 0
+
+                for bound, bucket in zip(cls.BUCKETS + ("+Inf",), value):
+                    count += bucket
+                    bucket_labels = cls.format_labels(labels + (("le", str(bound)),))
+                    lines.append(f"{name}_bucket{bucket_labels} {count}")
+
+                lines.append(f"{name}_sum{cls.format_labels(labels)} {value[-1]}")
+                lines.append(f"{name}_count{cls.format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def format_labels(labels: tuple) -> str:
+        """
+        Formats labels for the Prometheus text format.
+
+        Args:
+        - labels (tuple): The labels, as (name, value) pairs.
+
+        Returns:
+        - str: The formatted labels, empty if there are none.
+        """
+        if not labels:
+            return ""
+
+        escaped = (
+            f'{key}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+            for key, value in labels
+        )
+
+        return "{" + ",".join(escaped) + "}"
@@ -1,6 +1,10 @@
 import sqlite3
 import base64
+import hashlib
+import os
+import time
 from config import Config
+from .metrics import Metrics
 
 
 class User:
@@ -88,20 +92,78 @@ class Product:
         self.left_eye_data = left_eye_data
         self.right_eye_data = right_eye_data
 
-        with open(
-            f"{Config.PRODUCT_IMAGES_PATH}/{product_id}.{Config.PRODUCT_IMAGES_SUBFIX}",
-            "rb",
-        ) as im:
-            self.image = base64.b64encode(im.read()).decode("utf-8")
+        # The image is only loaded when it is needed
+        self.encoded_image: str | None = None
+
+    @property
+    def image(self) -> str:
+        """
+        The product's image, loaded and base64 encoded on first access.
+
+        Returns:
+        - str: The base64 encoded image.
+        """
+        if self.encoded_image is None:
+            started = time.perf_counter()
+
+            with open(Product.image_path(self.product_id), "rb") as im:
+                self.encoded_image = base64.b64encode(im.read()).decode("utf-8")
+
+            Metrics.add_timing("image", time.perf_counter() - started)
+
+        return self.encoded_image
+
+    @property
+    def image_url(self) -> str:
+        """
+        The URL the product's image is served at, relative to the server.
+
+        Returns:
+        - str: The URL of the image.
+        """
+        return f"/image/{self.product_id}"
+
+    @staticmethod
+    def image_path(product_id: int) -> str:
+        """
+        Returns the path of a product's image.
+
+        Args:
+        - product_id (int): The ID of the product.
+
+        Returns:
+        - str: The path of the image.
+        """
+        return f"{Config.PRODUCT_IMAGES_PATH}/{product_id}.{Config.PRODUCT_IMAGES_SUBFIX}"
+
+    @staticmethod
+    def version(product: sqlite3.Row) -> str:
+        """
+        Returns a version of a product that changes whenever its row or its image changes,
+        computed from the row's values and the image's modification time and size, without loading the image.
+
+        Args:
+        - product (sqlite3.Row): The database row representing the product.
+
+        Returns:
+        - str: The version.
+        """
+        image = os.stat(Product.image_path(product["productID"]))
+
+        return hashlib.blake2b(
+            repr((tuple(product), image.st_mtime_ns, image.st_size)).encode(),
+            digest_size=12,
+        ).hexdigest()
 
     def to_dict(
-        self, with_eyes_data: bool = True
+        self, with_eyes_data: bool = True, image_url: bool = False
     ) -> dict[str, str | int | float | bool]:
         """
         Converts the Product object to a dictionary.
 
         Args:
         - with_eyes_data (bool): Whether to include eye data in the dictionary.
+        - image_url (bool): Whether to include the URL of the image instead of the image itself.
 
         Returns:
         - dict: The dictionary representation of the Product object.
@@ -112,7 +174,7 @@ class Product:
                 "title": self.title,
                 "description": self.description,
                 "price": self.price,
-                "image": self.image,
+                "image": self.image_url if image_url else self.image,
                 "inWishlist": self.in_wishlist,
                 "leftEyeX": self.left_eye_data["x"],
                 "leftEyeY": self.left_eye_data["y"],
@@ -125,7 +187,7 @@ class Product:
             "title": self.title,
             "description": self.description,
             "price": self.price,
-            "image": self.image,
+            "image": self.image_url if image_url else self.image,
             "inWishlist": self.in_wishlist,
         }
 